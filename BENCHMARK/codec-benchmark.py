@@ -0,0 +1,137 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+from datetime import datetime
+
+from stageloader import load_stage
+
+# Payload builder, timing loop and environment report of the stage benchmark
+bench = load_stage('BENCHMARK/stage-benchmark.py')
+
+import codec
+from coldstart import module_available
+
+DEFAULT_SIZES = (1, 100, 10000)
+
+# Envelope formats and the package each needs
+ENVELOPE_FORMATS = (('json', None), ('msgpack', 'msgpack'), ('cbor', 'cbor2'))
+
+
+def payload_shapes(samples):
+    """Yield ``(shape name, object)`` for every JSON document passed between stages."""
+    payload = bench.build_payload(samples)
+    yield 'receiver.input', payload
+
+    processed = bench.receiver.process_message(payload)
+    yield 'receiver.output', {'processed_data': processed, 'timestamp': datetime.utcnow().isoformat(), 'status': 'success'}
+
+    for section, (extractor, extract_name, _, _) in bench.fused.SECTION_STAGES.items():
+        extracted = getattr(extractor, extract_name)(processed[section])
+        yield f'extract.output.{section}', {section: extracted, 'timestamp': datetime.utcnow().isoformat(), 'status': 'success'}
+
+
+def codec_cases(obj):
+    """Yield ``(operation, stdlib callable, codec callable)`` for one document."""
+    text = json.dumps(obj)
+    data = text.encode()
+    yield 'loads.str', lambda: json.loads(text), lambda: codec.loads(text)
+    yield 'loads.bytes', lambda: json.loads(data), lambda: codec.loads(data)
+    yield 'dumps', lambda: json.dumps(obj), lambda: codec.dumps(obj)
+
+
+def envelope_results(shape, samples, obj, repeat, min_time):
+    """State payload size and encode/decode time of ``obj`` as a stage output body.
+
+    ``state_bytes`` is the size of the body once Step Functions serializes
+    the state, so a plain JSON string body includes its escaping.
+    """
+    results = []
+    for encoding, package in ENVELOPE_FORMATS:
+        if package and not module_available(package):
+            continue
+        for compress_min_bytes in (0, 1):
+            codec.INTERSTAGE_COMPRESS_MIN_BYTES = compress_min_bytes
+            body = codec.encode_body(obj, 'benchmark/v1', encoding)
+            event = {'body': body}
+            encode_median = statistics.median(bench.measure(lambda: codec.encode_body(obj, 'benchmark/v1', encoding), repeat, min_time))
+            decode_median = statistics.median(bench.measure(lambda: codec.parse_event_body(event), repeat, min_time))
+            results.append({
+                'shape': shape,
+                'operation': f"envelope.{encoding}{'+zlib' if compress_min_bytes else ''}",
+                'samples': samples,
+                'state_bytes': len(json.dumps(body)),
+                'encode_median_ms': encode_median * 1000,
+                'decode_median_ms': decode_median * 1000
+            })
+            print(f"{shape:28} {results[-1]['operation']:21} {samples:>6} samples {results[-1]['state_bytes']:>10} B  "
+                  f"encode {encode_median * 1000:9.3f} ms  decode {decode_median * 1000:9.3f} ms", file=sys.stderr)
+    codec.INTERSTAGE_COMPRESS_MIN_BYTES = 0
+    return results
+
+
+def run(sizes, repeat, min_time, shape_filter=None, envelopes=False):
+    results = []
+    for samples in sizes:
+        for shape, obj in payload_shapes(samples):
+            if shape_filter and not any(part in shape for part in shape_filter):
+                continue
+            size = len(codec.dumps(obj).encode())
+            for operation, stdlib_func, codec_func in codec_cases(obj):
+                stdlib_median = statistics.median(bench.measure(stdlib_func, repeat, min_time))
+                codec_median = statistics.median(bench.measure(codec_func, repeat, min_time))
+                results.append({
+                    'shape': shape,
+                    'operation': operation,
+                    'samples': samples,
+                    'bytes': size,
+                    'stdlib_median_ms': stdlib_median * 1000,
+                    'codec_median_ms': codec_median * 1000,
+                    'speedup': stdlib_median / codec_median if codec_median > 0 else None,
+                    'codec_mb_per_sec': size / codec_median / 1e6 if codec_median > 0 else None
+                })
+                print(f"{shape:28} {operation:12} {samples:>6} samples {size:>10} B  "
+                      f"json {stdlib_median * 1000:9.3f} ms  {codec.BACKEND} {codec_median * 1000:9.3f} ms  "
+                      f"x{results[-1]['speedup']:.1f}", file=sys.stderr)
+            if envelopes:
+                results.extend(envelope_results(shape, samples, obj, repeat, min_time))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the shared JSON codec with the stdlib json module.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated samples per section (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='minimum runs per case')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds spent per case and codec')
+    parser.add_argument('--shapes', help='comma-separated substrings; only matching payload shapes are run')
+    parser.add_argument('--envelopes', action='store_true',
+                        help='also measure interstage envelope sizes and times for every installed format')
+    parser.add_argument('--seed', type=int, default=1037, help='random seed for the generated payloads')
+    parser.add_argument('--output', help='write results as JSON to this file (default: stdout)')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    shape_filter = args.shapes.split(',') if args.shapes else None
+
+    results = run(sizes, args.repeat, args.min_time, shape_filter, args.envelopes)
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'environment': bench.environment(),
+        'backend': codec.BACKEND,
+        'seed': args.seed,
+        'results': results
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
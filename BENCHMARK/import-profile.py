@@ -0,0 +1,150 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+from stageloader import STAGE_ROOT
+
+# Lambda handler modules, relative to the repository root
+HANDLER_PATTERNS = ('RECEIVE/*.py', 'EXTRACT/*.py', 'TRANSFORMandLOAD/*.py', 'FUSED/fused-pipeline.py')
+
+# Optional modules worth knowing about when they are imported at init
+HEAVY_MODULES = ('numpy', 'psycopg2', 'ijson', 'orjson', 'boto3')
+
+# Loads one handler in a fresh interpreter and prints how long that took
+_LOAD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from stageloader import load_stage
+load_stage(sys.argv[1])
+from coldstart import init_steps
+print(json.dumps({'init_ms': (time.perf_counter() - start) * 1000, 'init_steps': init_steps}))
+"""
+
+
+def handlers():
+    paths = []
+    for pattern in HANDLER_PATTERNS:
+        paths.extend(sorted(os.path.relpath(path, STAGE_ROOT) for path in glob.glob(os.path.join(STAGE_ROOT, pattern))))
+    return paths
+
+
+def parse_importtime(stderr):
+    """``{module: (self_us, cumulative_us, depth)}`` from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def profile(path, env):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _LOAD_SCRIPT, path],
+        capture_output=True, text=True, env=env, cwd=STAGE_ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Loading {path} failed:\n{result.stderr[-2000:]}")
+    timing = json.loads(result.stdout.strip().splitlines()[-1])
+    return timing, parse_importtime(result.stderr)
+
+
+def run(paths, repeat, top, env):
+    results = []
+    for path in paths:
+        # Keep the fastest of several cold starts; slower ones mostly measure noise
+        runs = [profile(path, env) for _ in range(repeat)]
+        timing, modules = min(runs, key=lambda item: item[0]['init_ms'])
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+        results.append({
+            'handler': path,
+            'init_ms': timing['init_ms'],
+            'import_ms': sum(cumulative for _, cumulative, depth in modules.values() if depth == 0) / 1000,
+            'init_steps': timing['init_steps'],
+            'modules': len(modules),
+            'heavy_modules': [name for name in HEAVY_MODULES if name in modules],
+            'top_imports': [
+                {'module': name, 'cumulative_ms': cumulative / 1000, 'self_ms': self_us / 1000}
+                for name, (self_us, cumulative, depth) in slowest
+                if depth == 0
+            ][:top]
+        })
+        print(f"{path:55} init {timing['init_ms']:8.1f} ms  heavy: {', '.join(results[-1]['heavy_modules']) or '-'}",
+              file=sys.stderr)
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Return the handlers whose init time is more than ``threshold`` slower than the baseline."""
+    with open(baseline_path) as f:
+        baseline = {item['handler']: item for item in json.load(f)['results']}
+
+    regressions = []
+    for item in results:
+        previous = baseline.get(item['handler'])
+        if previous is None or previous['init_ms'] <= 0:
+            continue
+        change = item['init_ms'] / previous['init_ms'] - 1
+        item['baseline_init_ms'] = previous['init_ms']
+        item['change'] = change
+        if change > threshold:
+            regressions.append(item)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the import and init time of every Lambda handler.')
+    parser.add_argument('--handlers', help='comma-separated substrings; only matching handlers are profiled')
+    parser.add_argument('--repeat', type=int, default=5, help='cold starts per handler; the fastest is reported')
+    parser.add_argument('--top', type=int, default=10, help='slowest top-level imports listed per handler')
+    parser.add_argument('--output', help='write the report as JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', help='report of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative init slowdown reported as a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    paths = handlers()
+    if args.handlers:
+        paths = [path for path in paths if any(part in path for part in args.handlers.split(','))]
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.join(STAGE_ROOT, 'COMMON'), env.get('PYTHONPATH')]))
+    # Logging and metrics records would only add noise to the measurement
+    env.setdefault('LOG_LEVEL', 'ERROR')
+    env.setdefault('METRICS_ENABLED', 'false')
+
+    results = run(paths, args.repeat, args.top, env)
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        report['regressions'] = [(item['handler'], round(item['change'], 3)) for item in regressions]
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    for item in regressions:
+        print(f"REGRESSION {item['handler']}: init {item['baseline_init_ms']:.1f} ms -> {item['init_ms']:.1f} ms "
+              f"({item['change']:+.1%})", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
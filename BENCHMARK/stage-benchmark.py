@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Keep stage logging out of the measurements unless asked for
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+import codec
+from stageloader import load_stage
+
+generator = load_stage('SCRIPT/sample-data-generation-script.py')
+receiver = load_stage('RECEIVE/payloadreceiver.py')
+fused = load_stage('FUSED/fused-pipeline.py')
+
+DEFAULT_SIZES = (1, 10, 100, 1000, 10000, 100000)
+
+
+def build_payload(samples, start_ms=1732524141755):
+    """A combined device payload with ``samples`` rows in every sectioned list."""
+    return generator.generate_combined_data(start_ms, samples)
+
+
+def stage_cases(payload):
+    """Yield ``(stage name, callable)`` for every stage, fed with its real input."""
+    processed = {section: receiver.process_section(section, data) for section, data in payload.items()}
+    for section, data in payload.items():
+        yield f'receive.process_section.{section}', lambda section=section, data=data: receiver.process_section(section, data)
+    yield 'receive.check_anomalies', lambda: receiver.check_anomalies(processed)
+
+    for section, (extractor, extract_name, loader, format_name) in fused.SECTION_STAGES.items():
+        extract = getattr(extractor, extract_name)
+        extracted = extract(processed[section])
+        yield f'extract.{extract_name}', lambda extract=extract, data=processed[section]: extract(data)
+
+        # Loaders receive the extractor output after a JSON hop in the step-by-step workflow
+        extracted = codec.loads(codec.dumps(extracted, default=str))
+        format_data = getattr(loader, format_name)
+        rows = getattr(loader, f'{section}_rows', None)
+        if rows is None:
+            yield f'load.{format_name}', lambda format_data=format_data, data=extracted: format_data(data)
+        else:
+            # A columnar TelemetryBatch is formatted lazily; build its rows as the loader does
+            yield f'load.{format_name}', lambda format_data=format_data, rows=rows, data=extracted: list(rows(format_data(data)))
+
+    # Validates, extracts and formats in-process, but stops before the database load
+    yield 'end_to_end.fused_before_load', lambda: fused.prepare_sections(payload)
+    yield 'end_to_end.json_hops', lambda: run_with_json_hops(payload)
+
+
+def run_with_json_hops(payload):
+    """Receive, extract and format with JSON encoding between stages, as the Lambdas do (no database)."""
+    body = codec.dumps(payload)
+    processed = receiver.process_message(codec.loads(body))
+    body = codec.dumps({'processed_data': processed})
+    processed = codec.loads(body)['processed_data']
+
+    formatted = {}
+    for section, (extractor, extract_name, loader, format_name) in fused.SECTION_STAGES.items():
+        extracted = getattr(extractor, extract_name)(processed[section])
+        extracted = codec.loads(codec.dumps({section: extracted}, default=str))[section]
+        formatted[section] = getattr(loader, format_name)(extracted)
+    return formatted
+
+
+def measure(func, repeat, min_time):
+    """Time ``func``: at least ``repeat`` runs and at least ``min_time`` seconds in total."""
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < repeat or time.perf_counter() - start < min_time:
+        call_start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - call_start)
+    return timings
+
+
+def run(sizes, repeat, min_time, stage_filter=None):
+    results = []
+    for samples in sizes:
+        payload = build_payload(samples)
+        for stage, func in stage_cases(payload):
+            if stage_filter and not any(part in stage for part in stage_filter):
+                continue
+            timings = measure(func, repeat, min_time)
+            best = min(timings)
+            results.append({
+                'stage': stage,
+                'samples': samples,
+                'runs': len(timings),
+                'min_ms': best * 1000,
+                'median_ms': statistics.median(timings) * 1000,
+                'mean_ms': statistics.fmean(timings) * 1000,
+                'samples_per_sec': samples / best if best > 0 else None
+            })
+            print(f"{stage:45} {samples:>7} samples  min {best * 1000:10.3f} ms  "
+                  f"median {statistics.median(timings) * 1000:10.3f} ms", file=sys.stderr)
+    return results
+
+
+def environment():
+    optional = {}
+    for module in ('numpy', 'ijson', 'orjson'):
+        try:
+            optional[module] = __import__(module).__version__
+        except ImportError:
+            optional[module] = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'optional_modules': optional,
+        'json_backend': codec.BACKEND,
+        'settings': {name: os.environ[name] for name in sorted(os.environ)
+                     if name.startswith(('TELEMETRY_', 'TIMESTAMP_', 'STREAM', 'DIAGNOSTIC_', 'LOG_LEVEL'))}
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Return the stages whose median is more than ``threshold`` slower than the baseline."""
+    with open(baseline_path) as f:
+        baseline = {(item['stage'], item['samples']): item for item in json.load(f)['results']}
+
+    regressions = []
+    for item in results:
+        previous = baseline.get((item['stage'], item['samples']))
+        if previous is None or previous['median_ms'] <= 0:
+            continue
+        change = item['median_ms'] / previous['median_ms'] - 1
+        item['baseline_median_ms'] = previous['median_ms']
+        item['change'] = change
+        if change > threshold:
+            regressions.append(item)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time each pipeline stage on generated payloads.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated samples per section (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='minimum runs per stage and size')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds spent per stage and size')
+    parser.add_argument('--stages', help='comma-separated substrings; only matching stages are run')
+    parser.add_argument('--seed', type=int, default=1037, help='random seed for the generated payloads')
+    parser.add_argument('--output', help='write results as JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', help='results file of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative median slowdown reported as a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    stage_filter = args.stages.split(',') if args.stages else None
+
+    results = run(sizes, args.repeat, args.min_time, stage_filter)
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'environment': environment(),
+        'seed': args.seed,
+        'results': results
+    }
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        report['regressions'] = [(item['stage'], item['samples'], round(item['change'], 3)) for item in regressions]
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    for item in regressions:
+        print(f"REGRESSION {item['stage']} at {item['samples']} samples: "
+              f"{item['baseline_median_ms']:.3f} ms -> {item['median_ms']:.3f} ms ({item['change']:+.1%})", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import json
+import operator
+import os
+from functools import lru_cache
+from itertools import compress
+from operator import itemgetter
+
+from coldstart import optional_module
+
+# Optional JSON file replacing DEFAULT_RULES, so thresholds change without a code deploy
+ANOMALY_RULES_PATH = os.environ.get('ANOMALY_RULES_PATH')
+# Sections with at least this many rows are checked with numpy, which is
+# imported on first use; smaller ones (and all of them without numpy) are
+# checked with list scans
+ANOMALY_VECTOR_MIN_ROWS = int(os.environ.get('ANOMALY_VECTOR_MIN_ROWS', '64'))
+
+# section -> json-ver ('*' applies to every version) -> rules.
+# 'rows' names the list of samples in the section (a single object counts as
+# one row); 'op' compares 'field' with 'value', or with another field of the
+# same row for the *_field operators.
+DEFAULT_RULES = {
+    'telemetry': {
+        '*': [
+            {'id': 'telemetry.flow_rate_range', 'rows': 'teleParam', 'field': 'flowRate', 'op': 'outside', 'value': [0, 100]},
+            {'id': 'telemetry.negative_discharge', 'rows': 'teleParam', 'field': 'discharge', 'op': 'lt', 'value': 0}
+        ]
+    },
+    'error': {
+        '*': [
+            {'id': 'error.high_error_code', 'rows': 'mspErrParam', 'field': 'err-code', 'op': 'gt', 'value': 200}
+        ]
+    },
+    'pump': {
+        '*': [
+            {'id': 'pump.stop_not_after_start', 'rows': 'pumpParam', 'field': 'PumpStoptTs', 'op': 'le_field', 'value': 'PumpStartTs'}
+        ]
+    },
+    'diagnostic': {
+        '*': [
+            {'id': 'diagnostic.rssi_range', 'rows': 'diagnosParam', 'field': 'RSSI', 'op': 'outside', 'value': [-120, -30]}
+        ]
+    }
+}
+
+_OPERATORS = {
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'eq': operator.eq,
+    'ne': operator.ne
+}
+
+
+def _load_rules():
+    if not ANOMALY_RULES_PATH:
+        return DEFAULT_RULES
+    with open(ANOMALY_RULES_PATH) as f:
+        return json.load(f)
+
+
+RULES = _load_rules()
+
+
+class CompiledRuleSet:
+    """All rules for one (section, json-ver), evaluated over the section's rows.
+
+    The fields used by any rule are read from every row in a single pass into
+    columns, and each rule is then one comparison over them, vectorized with
+    numpy for large sections.
+    """
+
+    def __init__(self, section, rules):
+        self.section = section
+        self.rules_by_rows = {}
+        for rule in rules:
+            if rule['op'] != 'outside' and rule['op'].removesuffix('_field') not in _OPERATORS:
+                raise ValueError(f"Unknown operator '{rule['op']}' in anomaly rule '{rule['id']}'")
+            self.rules_by_rows.setdefault(rule['rows'], []).append(rule)
+
+        # rows key -> fields read from each row, in column order
+        self.fields = {}
+        for rows_key, rows_rules in self.rules_by_rows.items():
+            fields = []
+            for rule in rows_rules:
+                for field in (rule['field'], rule['value'] if rule['op'].endswith('_field') else None):
+                    if field is not None and field not in fields:
+                        fields.append(field)
+            self.fields[rows_key] = fields
+
+    def evaluate(self, section_data):
+        anomalies = []
+        for rows_key, rows_rules in self.rules_by_rows.items():
+            rows = section_data.get(rows_key)
+            if isinstance(rows, dict):
+                rows = [rows]
+            if not rows:
+                continue
+
+            np = optional_module('numpy') if len(rows) >= ANOMALY_VECTOR_MIN_ROWS else None
+            fields = self.fields[rows_key]
+            columns = _columns(rows, fields, np)
+            for rule in rows_rules:
+                column = columns[fields.index(rule['field'])]
+                for row in _matches(rule, column, columns, fields, np):
+                    anomalies.append({
+                        'rule': rule['id'],
+                        'section': self.section,
+                        'row': row,
+                        'value': rows[row][rule['field']]
+                    })
+        return anomalies
+
+
+def _columns(rows, fields, np):
+    values = list(map(itemgetter(*fields), rows))
+    if len(fields) == 1:
+        values = [(value,) for value in values]
+    if np is not None:
+        # Missing (None) values become NaN and never match a rule
+        matrix = np.array(values, dtype=np.float64).reshape(len(rows), len(fields))
+        return [matrix[:, index] for index in range(len(fields))]
+    return [list(column) for column in zip(*values)]
+
+
+def _matches(rule, column, columns, fields, np):
+    op = rule['op']
+    if op.endswith('_field'):
+        compare, other = _OPERATORS[op.removesuffix('_field')], columns[fields.index(rule['value'])]
+    elif op == 'outside':
+        low, high = rule['value']
+        if np is not None:
+            return np.flatnonzero((column < low) | (column > high)).tolist()
+        return [index for index, value in enumerate(column) if value is not None and (value < low or value > high)]
+    else:
+        compare, other = _OPERATORS[op], rule['value']
+
+    if np is not None:
+        return np.flatnonzero(compare(column, other)).tolist()
+    if not isinstance(other, list):
+        other = [other] * len(column)
+    hits = (value is not None and other_value is not None and compare(value, other_value)
+            for value, other_value in zip(column, other))
+    return list(compress(range(len(column)), hits))
+
+
+def get_rule_set(section, json_ver):
+    """Compiled rules for ``section`` at ``json_ver``: the '*' rules plus version-specific ones."""
+    # json-ver comes from the payload; versions without rules of their own
+    # share the '*' rule set, so the cache only ever holds configured versions
+    if not isinstance(json_ver, str) or json_ver not in RULES.get(section, {}):
+        json_ver = '*'
+    return _compile_rule_set(section, json_ver)
+
+
+@lru_cache(maxsize=None)
+def _compile_rule_set(section, json_ver):
+    section_rules = RULES.get(section, {})
+    rules = list(section_rules.get('*', []))
+    if json_ver != '*':
+        rules.extend(section_rules.get(json_ver, []))
+    return CompiledRuleSet(section, rules)
+
+
+def find_anomalies(data):
+    """Evaluate every section in ``data`` and return structured anomaly records."""
+    anomalies = []
+    for section, section_data in data.items():
+        if section in RULES and isinstance(section_data, dict):
+            anomalies.extend(get_rule_set(section, section_data.get('json-ver', '*')).evaluate(section_data))
+    return anomalies
+
+
+# Compile every configured rule set at cold start
+for _section, _versions in RULES.items():
+    for _json_ver in _versions:
+        get_rule_set(_section, _json_ver)
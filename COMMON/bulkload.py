@@ -0,0 +1,177 @@
+import io
+import os
+import time
+from datetime import date, datetime
+from functools import lru_cache
+
+from psycopg2.extras import execute_values
+from metrics import count
+from pipelinelog import get_logger
+
+# Set up logging
+logger = get_logger('bulkload')
+
+# Batches with fewer rows than this use a multi-row INSERT instead of COPY
+COPY_MIN_ROWS = int(os.environ.get('COPY_MIN_ROWS', '500'))
+# Rows sent per multi-row INSERT statement
+INSERT_PAGE_SIZE = int(os.environ.get('INSERT_PAGE_SIZE', '500'))
+# Characters buffered in memory between reads of the COPY stream
+COPY_BUFFER_SIZE = 64 * 1024
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+@lru_cache(maxsize=None)
+def build_insert(table, columns, named=False, conflict=None, rollup=None):
+    """Build an ``execute_values`` statement and row template for ``table``.
+
+    ``columns`` must be a tuple. Results are cached, so the SQL is built once
+    per container rather than per batch or row. With ``named=True`` the template reads values from dict rows by column name.
+    ``conflict`` is a tuple of natural-key columns; rows whose key is already
+    stored are skipped. ``rollup`` is a statement reading the rows actually
+    inserted from a CTE named ``inserted``; it runs in the same statement.
+    The statement returns the number of rows it stored.
+    """
+    statement = _counted(f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s{_on_conflict(conflict)}", columns, rollup)
+    if named:
+        template = '(' + ', '.join(f'%({column})s' for column in columns) + ')'
+    else:
+        template = None
+    return statement, template
+
+
+def insert_values(cur, statement, rows, template=None, page_size=INSERT_PAGE_SIZE):
+    """Send ``rows`` (a list) as multi-row INSERT statements of ``page_size`` rows each.
+
+    ``statement`` comes from ``build_insert``. Returns the number of rows
+    stored; rows skipped as duplicates are added to ``rows_skipped``.
+    """
+    # Each page returns its own count
+    pages = execute_values(cur, statement, rows, template=template, page_size=page_size, fetch=True)
+    stored = sum(page_count for page_count, in pages)
+    count('rows_skipped', len(rows) - stored)
+    return stored
+
+
+def copy_rows(cur, table, columns, rows):
+    """Stream ``rows`` (tuples in ``columns`` order) into ``COPY table FROM STDIN``."""
+    stream = _CopyStream(rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream)
+    return stream.row_count
+
+
+def copy_rows_staged(cur, table, columns, rows, conflict=None, rollup=None):
+    """COPY ``rows`` into a staging table, then move them into ``table``.
+
+    COPY itself cannot skip duplicates or feed a rollup, so the rows land in
+    a temporary table first and are moved with one INSERT ... SELECT.
+    Returns ``(rows copied, rows stored)``.
+    """
+    stage = f"{table}_stage"
+    cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+    row_count = copy_rows(cur, stage, columns, rows)
+    column_list = ', '.join(columns)
+    cur.execute(_counted(
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage}{_on_conflict(conflict)}",
+        columns, rollup
+    ))
+    stored = cur.fetchone()[0]
+    # Empty the stage for the next batch in this transaction
+    cur.execute(f"TRUNCATE {stage}")
+    return row_count, stored
+
+
+def bulk_insert(cur, table, columns, rows, row_count=None, conflict=None, rollup=None):
+    """Load ``rows`` with COPY, or with multi-row INSERTs for small batches.
+
+    ``rows`` may be any iterable of tuples; pass ``row_count`` when it has no
+    ``len()``. ``conflict`` and ``rollup`` are as for ``build_insert``.
+    Returns the number of rows stored; rows skipped as duplicates are added
+    to ``rows_skipped``.
+    """
+    if row_count is None:
+        row_count = len(rows)
+    if row_count == 0:
+        return 0
+
+    start = time.perf_counter()
+    if row_count >= COPY_MIN_ROWS:
+        method = 'COPY'
+        if conflict or rollup:
+            row_count, stored = copy_rows_staged(cur, table, columns, rows, conflict, rollup)
+            count('rows_skipped', row_count - stored)
+        else:
+            row_count = stored = copy_rows(cur, table, columns, rows)
+    else:
+        method = 'INSERT'
+        statement, _ = build_insert(table, columns, conflict=conflict, rollup=rollup)
+        rows = rows if isinstance(rows, list) else list(rows)
+        row_count = len(rows)
+        stored = insert_values(cur, statement, rows)
+    elapsed = time.perf_counter() - start
+
+    logger.info(
+        f"Loaded {stored} of {row_count} rows into {table} via {method} in {elapsed * 1000:.2f} ms "
+        f"({row_count - stored} duplicates skipped, {row_count / elapsed if elapsed > 0 else 0:.0f} rows/s)"
+    )
+    return stored
+
+
+def _on_conflict(conflict):
+    return f" ON CONFLICT ({', '.join(conflict)}) DO NOTHING" if conflict else ''
+
+
+def _counted(statement, columns, rollup):
+    # Wrap an INSERT so it returns how many rows it stored, which with
+    # ON CONFLICT DO NOTHING may be fewer than were sent. A rollup runs as
+    # another data-modifying CTE over the same inserted rows.
+    if not rollup:
+        return f"WITH inserted AS ({statement} RETURNING 1) SELECT count(*) FROM inserted"
+    return (
+        f"WITH inserted AS ({statement} RETURNING {', '.join(columns)}), "
+        f"rolled_up AS ({rollup}) SELECT count(*) FROM inserted"
+    )
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.translate(_COPY_ESCAPES)
+    return str(value)
+
+
+class _CopyStream(io.TextIOBase):
+    """File-like view over an iterable of rows in COPY text format.
+
+    Rows are formatted on demand as psycopg2 reads, so only about
+    ``COPY_BUFFER_SIZE`` characters are held in memory at a time.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.row_count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = COPY_BUFFER_SIZE
+        parts = [self._buffer]
+        length = len(self._buffer)
+        for row in self._rows:
+            line = '\t'.join(_copy_value(value) for value in row) + '\n'
+            parts.append(line)
+            length += len(line)
+            self.row_count += 1
+            if length >= size:
+                break
+        data = ''.join(parts)
+        self._buffer = data[size:]
+        return data[:size]
@@ -0,0 +1,184 @@
+import base64
+import json
+import os
+import zlib
+from datetime import date, datetime, time as dt_time
+
+from coldstart import optional_module
+from metrics import count, timer
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json module is used without it
+    orjson = None
+
+# How stage outputs are handed to the next stage:
+#   'json'    - a JSON string in 'body' (default)
+#   'msgpack' - an envelope carrying base64 msgpack (needs the msgpack package)
+#   'cbor'    - an envelope carrying base64 CBOR (needs the cbor2 package)
+# Every stage decodes all three, so producers and consumers can switch one at a time.
+INTERSTAGE_ENCODING = os.environ.get('INTERSTAGE_ENCODING', 'json')
+# Encoded outputs at least this large are zlib-compressed inside an envelope,
+# whatever the encoding; 0 turns compression off
+INTERSTAGE_COMPRESS_MIN_BYTES = int(os.environ.get('INTERSTAGE_COMPRESS_MIN_BYTES', '0'))
+
+if INTERSTAGE_ENCODING not in ('json', 'msgpack', 'cbor'):
+    raise ValueError(f"Unsupported INTERSTAGE_ENCODING {INTERSTAGE_ENCODING!r}; use 'json', 'msgpack' or 'cbor'")
+
+# Version tag of the envelope layout
+ENVELOPE_VERSION = 'interstage/1'
+
+# Fast compression; stage outputs are repetitive JSON-like data that shrinks well at level 1
+_COMPRESS_LEVEL = 1
+
+# JSON backend in use, reported by the benchmarks
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# orjson options matching what json.dumps accepts: non-str keys are
+# converted to strings instead of raising
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def loads(data):
+    """Decode JSON from str, bytes, bytearray or memoryview.
+
+    orjson reads all of them in place; the stdlib fallback copies only a
+    memoryview, which it cannot read.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(obj, default=None):
+    """Encode ``obj`` as a compact JSON str.
+
+    Both backends write no spaces after separators, non-ASCII characters
+    as-is, and datetimes, dates and times as ISO 8601 strings. They differ
+    on non-finite floats: orjson writes NaN and Infinity as ``null``, the
+    stdlib as the non-standard ``NaN``/``Infinity`` tokens.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS).decode()
+        except TypeError:
+            # e.g. integers beyond 64 bits; let the stdlib encoder decide
+            pass
+    return json.dumps(obj, default=_isoformat_default(default), separators=(',', ':'), ensure_ascii=False)
+
+
+def _isoformat_default(default):
+    # orjson encodes datetime, date and time natively; match it on the stdlib path
+    def encode(value):
+        if isinstance(value, (datetime, date, dt_time)):
+            return value.isoformat()
+        if default is None:
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+        return default(value)
+    return encode
+
+
+def parse_event_body(event):
+    """The payload of a Lambda event.
+
+    A JSON ``body`` string (or bytes) is decoded, an interstage envelope is
+    unpacked, a ``body`` that is already an object is returned as-is, and an
+    event without ``body`` is its own payload.
+    """
+    if not isinstance(event, dict) or 'body' not in event:
+        return event
+    body = event['body']
+    if isinstance(body, (str, bytes, bytearray, memoryview)):
+        count('payload_bytes', len(body))
+        with timer('parse'):
+            body = loads(body)
+    return unwrap(body)
+
+
+def encode_body(obj, schema, encoding=None):
+    """The ``body`` of a stage output that the next stage reads.
+
+    With the 'json' encoding and no compression this is the usual JSON
+    string. Otherwise it is an envelope object, which Step Functions passes
+    on as-is instead of escaping a JSON string inside JSON:
+
+        {"envelope": "interstage/1", "schema": "<producer>/<version>",
+         "format": "msgpack", "compression": "zlib" or null, "data": "<base64>"}
+
+    Because ``data`` is base64, uncompressed msgpack/CBOR envelopes are not
+    reliably smaller than JSON; only compression shrinks them. An envelope
+    also hides its fields from Step Functions paths, e.g. the receiver's
+    ``processed_batch`` can no longer be iterated by a Map state.
+    """
+    encoding = encoding or INTERSTAGE_ENCODING
+    with timer('serialize'):
+        if encoding == 'json':
+            text = dumps(obj)
+            if not INTERSTAGE_COMPRESS_MIN_BYTES or len(text) < INTERSTAGE_COMPRESS_MIN_BYTES:
+                count('output_bytes', len(text))
+                return text
+            data = text.encode()
+        else:
+            data = _pack(encoding, obj)
+
+        compression = None
+        if INTERSTAGE_COMPRESS_MIN_BYTES and len(data) >= INTERSTAGE_COMPRESS_MIN_BYTES:
+            data = zlib.compress(data, _COMPRESS_LEVEL)
+            compression = 'zlib'
+        envelope = {
+            'envelope': ENVELOPE_VERSION,
+            'schema': schema,
+            'format': encoding,
+            'compression': compression,
+            'data': base64.b64encode(data).decode('ascii')
+        }
+    count('output_bytes', len(envelope['data']))
+    return envelope
+
+
+def is_envelope(obj):
+    return isinstance(obj, dict) and isinstance(obj.get('envelope'), str) and obj['envelope'].startswith('interstage/')
+
+
+def unwrap(obj):
+    """The payload inside an interstage envelope; anything else is returned unchanged."""
+    if not is_envelope(obj):
+        return obj
+    if obj['envelope'] != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported interstage envelope {obj['envelope']!r} (schema {obj.get('schema')!r})")
+
+    with timer('parse'):
+        data = base64.b64decode(obj['data'])
+        if obj.get('compression') == 'zlib':
+            data = zlib.decompress(data)
+        elif obj.get('compression') is not None:
+            raise ValueError(f"Unsupported envelope compression {obj['compression']!r} (schema {obj.get('schema')!r})")
+        return _unpack(obj['format'], data)
+
+
+def _pack(encoding, obj):
+    if encoding == 'msgpack':
+        return _serializer('msgpack').packb(obj, default=str)
+    if encoding == 'cbor':
+        return _serializer('cbor2').dumps(obj)
+    raise ValueError(f"Unsupported interstage encoding {encoding!r}; use 'json', 'msgpack' or 'cbor'")
+
+
+def _unpack(encoding, data):
+    if encoding == 'json':
+        return loads(data)
+    if encoding == 'msgpack':
+        return _serializer('msgpack').unpackb(data, raw=False)
+    if encoding == 'cbor':
+        return _serializer('cbor2').loads(data)
+    raise ValueError(f"Unsupported interstage encoding {encoding!r}")
+
+
+def _serializer(name):
+    # Binary serializers are optional and imported only when an envelope needs them
+    module = optional_module(name)
+    if module is None:
+        raise RuntimeError(f"The {name} package is required for {name} interstage envelopes")
+    return module
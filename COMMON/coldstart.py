@@ -0,0 +1,63 @@
+import importlib
+import importlib.util
+import os
+import time
+from functools import lru_cache
+
+from pipelinelog import get_logger
+
+# Set up logging
+logger = get_logger('coldstart')
+
+# Work done while the container initialized: step name -> duration in ms
+init_steps = {}
+
+
+@lru_cache(maxsize=None)
+def optional_module(name):
+    """Import ``name`` on first use; None when it is not installed.
+
+    Lets a stage depend on a heavy optional module such as numpy only on
+    the code paths that use it, instead of paying for it at cold start.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def module_available(name):
+    """Whether ``name`` can be imported, without importing it."""
+    return importlib.util.find_spec(name) is not None
+
+
+def run_at_init(step, func):
+    """Run ``func`` during the init phase and record how long it took.
+
+    A failure is logged instead of raised, so the handler still loads and
+    the work happens on first use instead.
+    """
+    start = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        logger.warning(f"Init step {step} failed; it will be retried on first use: {e}")
+    finally:
+        init_steps[step] = (time.perf_counter() - start) * 1000
+
+
+def process_age_ms():
+    """Milliseconds since this process started, or None where /proc is not available.
+
+    Taken at the first invocation, this is the container's init duration,
+    including the runtime's own start-up. The resolution is one clock tick
+    (usually 10 ms).
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 (starttime), counted from the field after the command name
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        return (time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK')) * 1000
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from coldstart import run_at_init
+from metrics import timer
+from pipelinelog import get_logger
+
+# Set up logging
+logger = get_logger('dbpool')
+
+# Database connection parameters
+DB_HOST = os.environ.get('DB_HOST', '54.147.228.91')
+DB_NAME = os.environ.get('DB_NAME', 'postgres')
+DB_USER = os.environ.get('DB_USER', 'postgres')
+DB_PASSWORD = os.environ.get('DB_PASSWORD', 'postgresql')
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', '10'))
+
+# Pool settings (per container)
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '30'))
+# Idle connections older than this (seconds) are health-checked before reuse
+DB_HEALTHCHECK_INTERVAL = float(os.environ.get('DB_HEALTHCHECK_INTERVAL', '30'))
+# Open one connection while the container initializes instead of in the first invocation
+DB_CONNECT_AT_INIT = os.environ.get('DB_CONNECT_AT_INIT', 'false').lower() == 'true'
+
+
+class PipelineConnection(extensions.connection):
+    """psycopg2 connection that runs callbacks once its transaction commits.
+
+    Callbacks registered with ``after_commit`` are dropped on rollback, so
+    they only ever see work that is durably stored. A failing callback is
+    logged and does not make ``commit`` raise, since the data is already
+    committed by then.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._after_commit = []
+
+    def after_commit(self, callback):
+        self._after_commit.append(callback)
+
+    def commit(self):
+        super().commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in after-commit callback {callback!r}: {e}")
+
+    def rollback(self):
+        self._after_commit = []
+        super().rollback()
+
+
+class ConnectionManager:
+    """Keeps PostgreSQL connections open across warm Lambda invocations.
+
+    Connections are opened lazily, health-checked when they have been idle
+    for longer than ``healthcheck_interval`` and replaced if the check fails.
+    At most ``max_size`` connections are checked out at once. One more
+    connection, outside that cap, is reserved for short maintenance
+    transactions such as partition DDL (see ``reserved``).
+    """
+
+    def __init__(self, max_size=DB_POOL_MAX_SIZE, healthcheck_interval=DB_HEALTHCHECK_INTERVAL):
+        self.max_size = max_size
+        self.healthcheck_interval = healthcheck_interval
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._reserved = None
+        self._reserved_used = 0.0
+        self._reserved_lock = threading.Lock()
+        self._stats = {
+            'connects': 0,
+            'connect_ms': 0.0,
+            'reuses': 0,
+            'reuse_ms': 0.0,
+            'healthcheck_failures': 0
+        }
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT):
+            raise RuntimeError(f"Timed out waiting for a database connection (pool size {self.max_size})")
+
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except Exception:
+            conn = self._rollback(conn)
+            raise
+        finally:
+            self._checkin(conn)
+            self._slots.release()
+
+    @contextmanager
+    def reserved(self):
+        """Borrow the reserved connection, opening it on first use.
+
+        It does not count against ``max_size``, so a load that already holds
+        pooled connections can still run a short transaction on it without
+        waiting for itself. Callers take turns on the one connection and must
+        commit before returning it.
+        """
+        with self._reserved_lock:
+            conn = self._reserved
+            if conn is not None and (
+                conn.closed
+                or (time.monotonic() - self._reserved_used > self.healthcheck_interval and not self._is_healthy(conn))
+            ):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            try:
+                yield conn
+            except Exception:
+                conn = self._rollback(conn)
+                raise
+            finally:
+                if conn is not None and not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn = self._rollback(conn)
+                self._reserved = conn
+                self._reserved_used = time.monotonic()
+
+    def prewarm(self):
+        """Open (or health-check) one connection now and leave it idle in the pool."""
+        with self.connection():
+            pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        return stats
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+        with self._reserved_lock:
+            reserved, self._reserved = self._reserved, None
+        if reserved is not None:
+            self._discard(reserved)
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+
+            start = time.perf_counter()
+            if conn.closed:
+                continue
+            if time.monotonic() - last_used > self.healthcheck_interval and not self._is_healthy(conn):
+                with self._lock:
+                    self._stats['healthcheck_failures'] += 1
+                logger.warning("Discarding stale PostgreSQL connection that failed its health check")
+                self._discard(conn)
+                continue
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._stats['reuses'] += 1
+                self._stats['reuse_ms'] += elapsed_ms
+            logger.info(f"Reused warm PostgreSQL connection in {elapsed_ms:.2f} ms")
+            return conn
+
+        return self._connect()
+
+    def _connect(self):
+        start = time.perf_counter()
+        with timer('db_connect'):
+            conn = psycopg2.connect(
+                host=DB_HOST,
+                database=DB_NAME,
+                user=DB_USER,
+                password=DB_PASSWORD,
+                connect_timeout=DB_CONNECT_TIMEOUT,
+                connection_factory=PipelineConnection
+            )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['connects'] += 1
+            self._stats['connect_ms'] += elapsed_ms
+        logger.info(f"Opened new PostgreSQL connection in {elapsed_ms:.2f} ms")
+        return conn
+
+    def _checkin(self, conn):
+        if conn is None or conn.closed:
+            return
+        # Never hand out a connection with an open transaction
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn = self._rollback(conn)
+            if conn is None:
+                return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    def _rollback(self, conn):
+        if conn is None or conn.closed:
+            return None
+        try:
+            conn.rollback()
+            return conn
+        except psycopg2.Error:
+            self._discard(conn)
+            return None
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+# Module-level pool, shared by every invocation of a warm container
+db_pool = ConnectionManager()
+
+if DB_CONNECT_AT_INIT:
+    run_at_init('db_connect', db_pool.prewarm)
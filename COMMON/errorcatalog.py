@@ -0,0 +1,129 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+from pipelinelog import get_logger
+
+# Catalog file; defaults to the one shipped next to this module
+ERROR_CATALOG_PATH = os.environ.get(
+    'ERROR_CATALOG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'errorcatalog.json')
+)
+# Directory holding other catalog versions, one errorcatalog-<version>.json each
+ERROR_CATALOG_DIR = os.environ.get('ERROR_CATALOG_DIR', os.path.dirname(ERROR_CATALOG_PATH))
+# Catalog version the pipeline expects; unset means the ERROR_CATALOG_PATH catalog
+ERROR_CATALOG_VERSION = os.environ.get('ERROR_CATALOG_VERSION')
+# Versioned catalogs (or failed lookups) kept per container
+ERROR_CATALOG_CACHE_SIZE = int(os.environ.get('ERROR_CATALOG_CACHE_SIZE', '8'))
+
+# Versions are file name parts, so only these characters are accepted
+_VERSION_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]{0,63}')
+
+logger = get_logger('errorcatalog')
+
+ErrorInfo = namedtuple('ErrorInfo', ['code', 'description', 'severity', 'category', 'category_id'])
+
+UNKNOWN_CATEGORY_ID = 0
+
+
+class ErrorCatalog:
+    """Immutable index of device error codes, loaded once per container."""
+
+    def __init__(self, version, errors, categories):
+        self.version = version
+        self.categories = MappingProxyType(dict(categories))
+        self.errors = MappingProxyType({
+            entry['code']: ErrorInfo(
+                entry['code'],
+                entry['description'],
+                entry.get('severity', 'unknown'),
+                entry.get('category', 'unknown'),
+                self.categories.get(entry.get('category'), UNKNOWN_CATEGORY_ID)
+            )
+            for entry in errors
+        })
+
+    @classmethod
+    def load(cls, path=ERROR_CATALOG_PATH):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['version'], data['errors'], data.get('categories', {}))
+
+    def lookup(self, code):
+        info = self.errors.get(code)
+        if info is None:
+            return ErrorInfo(code, 'Unknown error', 'unknown', 'unknown', UNKNOWN_CATEGORY_ID)
+        return info
+
+    def lookup_many(self, codes):
+        """Resolve a whole array of codes, looking up each distinct code once."""
+        resolved = {code: self.lookup(code) for code in set(codes)}
+        return [resolved[code] for code in codes]
+
+
+_default = None
+# version -> ErrorCatalog, or None when that version could not be loaded
+_versions = OrderedDict()
+_lock = threading.Lock()
+
+
+def catalog_path(version):
+    """Path of the catalog file for ``version`` in ERROR_CATALOG_DIR."""
+    return os.path.join(ERROR_CATALOG_DIR, f'errorcatalog-{version}.json')
+
+
+def get_catalog(version=ERROR_CATALOG_VERSION):
+    """Return the catalog for ``version``, or the default catalog.
+
+    The default catalog (ERROR_CATALOG_PATH) is read on first use. Any other
+    version is read from ``catalog_path(version)`` once and cached, and the
+    file's own ``version`` field must match. A version that is malformed,
+    missing or mismatched logs a warning and falls back to the default
+    catalog; the failure is cached too, so repeated requests for it do not
+    touch the file system again.
+    """
+    global _default
+    default = _default
+    if default is None:
+        with _lock:
+            if _default is None:
+                _default = ErrorCatalog.load()
+            default = _default
+    if version is None or version == default.version:
+        return default
+    if not isinstance(version, str):
+        logger.warning(f"Ignoring error catalog version {version!r}; using the default catalog")
+        return default
+
+    try:
+        catalog = _versions[version]
+    except KeyError:
+        with _lock:
+            if version not in _versions:
+                _versions[version] = _load_version(version)
+                while len(_versions) > ERROR_CATALOG_CACHE_SIZE:
+                    _versions.popitem(last=False)
+            catalog = _versions[version]
+    return catalog if catalog is not None else default
+
+
+def _load_version(version):
+    if not _VERSION_PATTERN.fullmatch(version):
+        logger.warning(f"Ignoring malformed error catalog version {version!r}; using the default catalog")
+        return None
+    path = catalog_path(version)
+    try:
+        catalog = ErrorCatalog.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Error catalog version {version!r} is not available ({e}); using the default catalog")
+        return None
+    if catalog.version != version:
+        logger.warning(
+            f"Error catalog {path} holds version {catalog.version!r}, not the requested {version!r}; "
+            f"using the default catalog"
+        )
+        return None
+    return catalog
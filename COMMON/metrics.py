@@ -0,0 +1,168 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from coldstart import init_steps, process_age_ms
+
+# Set to 'false' to turn off phase timers and the per-invocation metrics record
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+# CloudWatch namespace the embedded metrics are published under
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ServerlessETL')
+
+# Record of the invocation being handled. Worker threads see it only when
+# they run in a copy of the submitting context (contextvars.copy_context).
+_current = ContextVar('invocation_metrics', default=None)
+
+# Stages that have handled an invocation in this container
+_warm_stages = set()
+
+
+def _unit(name):
+    if name.endswith('_ms'):
+        return 'Milliseconds'
+    if name.endswith('_bytes'):
+        return 'Bytes'
+    return 'Count'
+
+
+class InvocationMetrics:
+    """Phase durations and counts of one handler invocation.
+
+    Durations of a phase that runs more than once, or on several threads at
+    once, are added up.
+    """
+
+    def __init__(self, stage, request_id=None, cold_start=False):
+        self.stage = stage
+        self.request_id = request_id
+        self.cold_start = cold_start
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, value):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+    def to_emf(self):
+        """The record in CloudWatch Embedded Metric Format."""
+        with self._lock:
+            values = dict(self.values)
+        values['cold_start'] = int(self.cold_start)
+
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Stage']],
+                    'Metrics': [{'Name': name, 'Unit': _unit(name)} for name in values]
+                }]
+            },
+            'Stage': self.stage
+        }
+        if self.request_id:
+            record['RequestId'] = self.request_id
+        record.update((name, round(value, 3) if isinstance(value, float) else value) for name, value in values.items())
+        return record
+
+
+class _Timer:
+    __slots__ = ('name', 'record', 'start')
+
+    def __init__(self, phase):
+        self.name = f"{phase}_ms"
+
+    def __enter__(self):
+        self.record = _current.get()
+        if self.record is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.record is not None:
+            self.record.add(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def timer(phase):
+    """Context manager adding the time spent in its block to ``<phase>_ms``.
+
+    Outside an instrumented invocation it only costs a context variable
+    lookup.
+    """
+    return _Timer(phase)
+
+
+def timed(phase):
+    """Decorator form of ``timer``."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with _Timer(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Add ``value`` to the counter ``name`` (e.g. rows, payload_bytes) of this invocation."""
+    record = _current.get()
+    if record is not None:
+        record.add(name, value)
+
+
+def instrumented(stage):
+    """Decorate a Lambda handler to emit one metrics record per invocation.
+
+    The record holds every phase timed and every count added while the
+    handler runs, the total duration and whether the handler failed, and is
+    written to stdout as one line of CloudWatch EMF JSON. A handler called
+    from within another instrumented invocation adds to the caller's record.
+    """
+    def decorate(handler):
+        if not METRICS_ENABLED:
+            return handler
+
+        @wraps(handler)
+        def wrapper(event, context):
+            if _current.get() is not None:
+                return handler(event, context)
+
+            record = InvocationMetrics(stage, getattr(context, 'aws_request_id', None), stage not in _warm_stages)
+            if record.cold_start:
+                _warm_stages.add(stage)
+                _record_init(record)
+            token = _current.set(record)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = handler(event, context)
+                failed = isinstance(result, dict) and result.get('statusCode', 200) >= 500
+                return result
+            finally:
+                record.add('total_ms', (time.perf_counter() - start) * 1000)
+                record.add('errors', int(failed))
+                _current.reset(token)
+                emit(record)
+        return wrapper
+    return decorate
+
+
+def _record_init(record):
+    # The first record of a container also carries its init duration
+    init_ms = process_age_ms()
+    if init_ms is not None:
+        record.add('init_ms', init_ms)
+    for step, duration_ms in init_steps.items():
+        record.add(f"init_{step}_ms", duration_ms)
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record.to_emf(), separators=(',', ':')) + '\n')
+    sys.stdout.flush()
@@ -0,0 +1,202 @@
+import os
+import re
+import threading
+from datetime import date, timezone
+from functools import lru_cache
+
+from psycopg2 import errors
+from metrics import count
+from pipelinelog import get_logger
+
+# Set up logging
+logger = get_logger('partitions')
+
+# Partition naming per interval, e.g. telemetry_data_20241125 or telemetry_data_202411
+_NAME_FORMATS = {'day': '%Y%m%d', 'month': '%Y%m'}
+
+# How long a partition's own transaction waits for the lock on the parent
+# table before the partition is created in the load transaction instead
+PARTITION_LOCK_TIMEOUT_MS = int(os.environ.get('PARTITION_LOCK_TIMEOUT_MS', '2000'))
+
+# Upper bound of a partition, as printed by pg_get_expr(relpartbound) in UTC
+_UPPER_BOUND = re.compile(r"TO \('(\d{4}-\d{2}-\d{2})")
+
+
+@lru_cache(maxsize=4096)
+def _date_prefix(prefix):
+    # ISO strings from one batch share a handful of days
+    return date.fromisoformat(prefix)
+
+
+def _to_date(value):
+    """UTC calendar date of an ISO string or datetime."""
+    if isinstance(value, str):
+        return _date_prefix(value[:10])
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+class PartitionManager:
+    """Creates and routes to the daily or monthly range partitions of a table.
+
+    The names of existing partitions are read from the catalog once and then
+    cached, so a warm loader does not query the catalog on every insert.
+    Partitions are created for every period a batch touches, plus
+    ``precreate`` periods ahead of its newest row.
+
+    Catalog reads and partition creation run on a separate connection from
+    ``connection`` (a context manager factory such as ``db_pool.reserved``,
+    which does not count against the pool's cap), each in its own short
+    transaction, so the lock that creation takes on the parent table is not
+    held for the whole load. A partition another
+    container created first is simply added to the cache. If the parent is
+    already locked by the load transaction itself (an earlier chunk or
+    message in the same transaction wrote to it), the short transaction
+    gives up after PARTITION_LOCK_TIMEOUT_MS and the partition is created in
+    the load transaction instead, which holds that lock until the load
+    commits; this is logged and counted as ``partition_fallbacks``.
+
+    Partitions not named by this manager, such as one holding the data from
+    before the table was partitioned, are left alone: periods starting before
+    their upper bound are routed through the parent table.
+    """
+
+    def __init__(self, table, interval, connection, precreate=2):
+        if interval not in _NAME_FORMATS:
+            raise ValueError(f"Unsupported partition interval {interval!r}; use 'day' or 'month'")
+        self.table = table
+        self.interval = interval
+        self.precreate = precreate
+        self._connection = connection
+        self._known = None
+        self._floor = None
+        self._lock = threading.Lock()
+
+    def period_start(self, value):
+        day = _to_date(value)
+        return day.replace(day=1) if self.interval == 'month' else day
+
+    def next_period(self, start):
+        if self.interval == 'month':
+            return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        return date.fromordinal(start.toordinal() + 1)
+
+    def partition_name(self, start):
+        return f"{self.table}_{start.strftime(_NAME_FORMATS[self.interval])}"
+
+    def route(self, cur, rows, ts_index):
+        """Group ``rows`` by target partition, creating missing partitions first.
+
+        Returns ``{table name: [rows]}``. Rows of periods the manager does not
+        own are routed to the parent table.
+        """
+        groups = {}
+        for row in rows:
+            groups.setdefault(self.period_start(row[ts_index]), []).append(row)
+        if not groups:
+            return {}
+
+        available = self.ensure(cur, groups)
+        routed = {}
+        for start, period_rows in groups.items():
+            name = self.partition_name(start)
+            routed.setdefault(name if name in available else self.table, []).extend(period_rows)
+        return routed
+
+    def ensure(self, cur, periods):
+        """Create the partitions of ``periods`` and of the ``precreate`` periods after them.
+
+        ``cur`` is the load transaction's cursor, used only as a fallback.
+        Returns the names of the partitions that exist once that transaction
+        commits.
+        """
+        known = self._load_known()
+        floor = self._floor
+
+        wanted = set(periods)
+        ahead = max(wanted)
+        for _ in range(self.precreate):
+            ahead = self.next_period(ahead)
+            wanted.add(ahead)
+
+        missing = [
+            start for start in sorted(wanted)
+            # Periods covered by unmanaged partitions stay with the parent
+            if self.partition_name(start) not in known and (floor is None or start >= floor)
+        ]
+        if not missing:
+            return known
+
+        created = {self._create(cur, start) for start in missing}
+        return self._load_known().union(created)
+
+    def forget(self):
+        """Drop the cache, e.g. after partitions were detached or dropped."""
+        with self._lock:
+            self._known = None
+            self._floor = None
+
+    def _create(self, cur, start):
+        name = self.partition_name(start)
+        statement = f"CREATE TABLE {name} PARTITION OF {self.table} FOR VALUES FROM (%s) TO (%s)"
+        bounds = (f"{start.isoformat()} 00:00:00+00", f"{self.next_period(start).isoformat()} 00:00:00+00")
+
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as ddl:
+                    ddl.execute("SET LOCAL lock_timeout = %s", (f"{PARTITION_LOCK_TIMEOUT_MS}ms",))
+                    ddl.execute(statement, bounds)
+                conn.commit()
+            logger.info(f"Created partition {name} of {self.table}")
+        except (errors.DuplicateTable, errors.UniqueViolation):
+            # Another container created it between our catalog read and now
+            logger.info(f"Partition {name} of {self.table} was created concurrently")
+        except errors.LockNotAvailable:
+            logger.warning(
+                f"Parent {self.table} stayed locked for {PARTITION_LOCK_TIMEOUT_MS} ms; creating partition {name} "
+                f"in the load transaction, which holds ACCESS EXCLUSIVE on {self.table} until it commits"
+            )
+            count('partition_fallbacks')
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.table} FOR VALUES FROM (%s) TO (%s)", bounds)
+            cur.connection.after_commit(lambda: self._remember([name]))
+            return name
+
+        self._remember([name])
+        return name
+
+    def _load_known(self):
+        if self._known is None:
+            with self._connection() as conn:
+                with conn.cursor() as cur:
+                    # pg_get_expr prints bounds in the session time zone
+                    cur.execute("SET LOCAL TIME ZONE 'UTC'")
+                    cur.execute(
+                        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                        "WHERE i.inhparent = %s::regclass",
+                        (self.table,)
+                    )
+                    partitions = cur.fetchall()
+                conn.commit()
+
+            known = set()
+            floor = None
+            prefix = f"{self.table}_"
+            for name, bound in partitions:
+                known.add(name)
+                if name.startswith(prefix) and name[len(prefix):].isdigit():
+                    continue
+                match = _UPPER_BOUND.search(bound or '')
+                if match:
+                    upper = date.fromisoformat(match.group(1))
+                    floor = upper if floor is None else max(floor, upper)
+            with self._lock:
+                self._known = known
+                self._floor = floor
+        return self._known
+
+    def _remember(self, created):
+        with self._lock:
+            if self._known is not None:
+                self._known.update(created)
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import random
+
+# Defaults for every stage; override per stage with e.g. LOG_LEVEL_TELEMETRY_EXTRACT
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# Fraction of payload log records that are emitted (0.0 - 1.0)
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', '1.0'))
+# Serialized payloads are cut off after this many characters
+LOG_PAYLOAD_MAX_BYTES = int(os.environ.get('LOG_PAYLOAD_MAX_BYTES', '4096'))
+
+_sample_rates = {}
+
+
+def _stage_setting(name, stage, default):
+    return os.environ.get(f"{name}_{stage.upper().replace('-', '_')}", default)
+
+
+def get_logger(stage):
+    """Return the logger for a pipeline stage, configured from the environment.
+
+    Stage loggers propagate to the root logger, so records still reach the
+    Lambda log handler, but each stage keeps its own level and sample rate.
+    """
+    logger = logging.getLogger(f'pipeline.{stage}')
+    logger.setLevel(_stage_setting('LOG_LEVEL', stage, LOG_LEVEL).upper())
+    _sample_rates[logger.name] = float(_stage_setting('LOG_PAYLOAD_SAMPLE_RATE', stage, LOG_PAYLOAD_SAMPLE_RATE))
+    return logger
+
+
+def log_payload(logger, label, payload, level=logging.INFO):
+    """Log ``payload`` as JSON, serializing it only if the record is emitted."""
+    if not logger.isEnabledFor(level):
+        return
+    sample_rate = _sample_rates.get(logger.name, LOG_PAYLOAD_SAMPLE_RATE)
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.log(level, "%s: %s", label, LazyJson(payload))
+
+
+class LazyJson:
+    """Defers ``json`` serialization of a log argument until it is formatted.
+
+    Encoding stops once ``max_bytes`` characters have been produced, so a
+    large payload costs no more to log than a small one.
+    """
+
+    __slots__ = ('payload', 'max_bytes')
+
+    _encoder = json.JSONEncoder(default=str)
+
+    def __init__(self, payload, max_bytes=LOG_PAYLOAD_MAX_BYTES):
+        self.payload = payload
+        self.max_bytes = max_bytes
+
+    def __str__(self):
+        parts = []
+        length = 0
+        for chunk in self._encoder.iterencode(self.payload):
+            parts.append(chunk)
+            length += len(chunk)
+            if length > self.max_bytes:
+                return ''.join(parts)[:self.max_bytes] + '...<truncated>'
+        return ''.join(parts)
@@ -0,0 +1,69 @@
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import count
+
+# Natural keys remembered per table; 0 turns the filter off
+RECENT_KEYS_MAX_SIZE = int(os.environ.get('RECENT_KEYS_MAX_SIZE', '100000'))
+
+
+class RecentKeys:
+    """Bounded LRU set of natural keys committed by this container.
+
+    It drops obvious redeliveries before they reach the database. A key is
+    remembered only after the transaction that wrote it has committed, so a
+    rolled-back row is never mistaken for a stored one. The filter is a fast
+    path only: ``ON CONFLICT`` in the database still catches duplicates it
+    has forgotten or that another container wrote.
+    """
+
+    def __init__(self, key, maxsize=RECENT_KEYS_MAX_SIZE):
+        self.key = key
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def drop_seen(self, cur, rows):
+        """Drop rows whose key was committed before or repeats within ``rows``.
+
+        Returns the kept rows as a list (``rows`` itself when the filter is
+        off). Their keys are remembered once ``cur``'s transaction commits.
+        """
+        if self.maxsize <= 0:
+            return rows
+
+        key = self.key
+        fresh = []
+        fresh_keys = {}
+        with self._lock:
+            hits = self.hits
+            for row in rows:
+                row_key = key(row)
+                if row_key in self._keys:
+                    self._keys.move_to_end(row_key)
+                    self.hits += 1
+                elif row_key in fresh_keys:
+                    self.hits += 1
+                else:
+                    fresh_keys[row_key] = None
+                    fresh.append(row)
+            dropped = self.hits - hits
+
+        # Dropped rows are duplicates the database never sees
+        count('rows_skipped', dropped)
+        if fresh_keys:
+            cur.connection.after_commit(lambda: self.remember(fresh_keys))
+        return fresh
+
+    def remember(self, keys):
+        with self._lock:
+            for row_key in keys:
+                self._keys[row_key] = None
+                self._keys.move_to_end(row_key)
+            while len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+
+    def __len__(self):
+        return len(self._keys)
@@ -0,0 +1,66 @@
+import os
+
+# Bucket widths kept up to date at load time, e.g. 'minute,hour'; empty turns
+# rollups off. Any date_trunc field from BUCKET_WIDTHS may be used.
+ROLLUP_BUCKETS = tuple(
+    width.strip() for width in os.environ.get('ROLLUP_BUCKETS', '').split(',') if width.strip()
+)
+
+BUCKET_WIDTHS = ('minute', 'hour', 'day')
+
+for _width in ROLLUP_BUCKETS:
+    if _width not in BUCKET_WIDTHS:
+        raise ValueError(f"Unsupported rollup bucket {_width!r}; use one of {BUCKET_WIDTHS}")
+
+
+def _widths_sql(widths):
+    return ', '.join(f"('{width}')" for width in widths)
+
+
+def telemetry_rollup_sql(widths=ROLLUP_BUCKETS):
+    """Merge the rows of an ``inserted`` CTE into telemetry_rollups.
+
+    Discharge is a cumulative counter, so buckets keep its min and max; the
+    delta within a bucket is ``discharge_max - discharge_min``.
+    """
+    if not widths:
+        return None
+    return f"""
+    INSERT INTO telemetry_rollups AS r (
+        token, bucket_width, bucket, sample_count,
+        flow_rate_min, flow_rate_max, flow_rate_sum, discharge_min, discharge_max
+    )
+    SELECT inserted.token, w.width, date_trunc(w.width, inserted.timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+           count(*), min(inserted.flow_rate), max(inserted.flow_rate), sum(inserted.flow_rate),
+           min(inserted.discharge), max(inserted.discharge)
+    FROM inserted CROSS JOIN (VALUES {_widths_sql(widths)}) AS w (width)
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (token, bucket_width, bucket) DO UPDATE SET
+        sample_count = r.sample_count + EXCLUDED.sample_count,
+        flow_rate_min = LEAST(r.flow_rate_min, EXCLUDED.flow_rate_min),
+        flow_rate_max = GREATEST(r.flow_rate_max, EXCLUDED.flow_rate_max),
+        flow_rate_sum = r.flow_rate_sum + EXCLUDED.flow_rate_sum,
+        discharge_min = LEAST(r.discharge_min, EXCLUDED.discharge_min),
+        discharge_max = GREATEST(r.discharge_max, EXCLUDED.discharge_max)
+    """
+
+
+def pump_rollup_sql(widths=ROLLUP_BUCKETS):
+    """Merge the rows of an ``inserted`` CTE into pump_rollups, bucketed by pump start."""
+    if not widths:
+        return None
+    return f"""
+    INSERT INTO pump_rollups AS r (
+        token, bucket_width, bucket, cycle_count, duration_seconds_sum, discharge_sum
+    )
+    SELECT inserted.token, w.width, date_trunc(w.width, inserted.pump_start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+           count(*), sum(inserted.pump_duration_seconds), sum(inserted.discharge_difference)
+    FROM inserted CROSS JOIN (VALUES {_widths_sql(widths)}) AS w (width)
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (token, bucket_width, bucket) DO UPDATE SET
+        cycle_count = r.cycle_count + EXCLUDED.cycle_count,
+        duration_seconds_sum = r.duration_seconds_sum + EXCLUDED.duration_seconds_sum,
+        discharge_sum = r.discharge_sum + EXCLUDED.discharge_sum
+    """
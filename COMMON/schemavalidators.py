@@ -0,0 +1,111 @@
+from functools import lru_cache
+
+# Fields every section must carry
+COMMON_FIELDS = ('token', 'status', 'json-ver')
+
+# section -> json-ver ('*' is used for versions without their own entry) -> schema.
+# 'rows' names the list of samples and 'row_fields' the keys each sample needs;
+# 'fields' lists extra keys required on the section itself.
+SECTION_SCHEMAS = {
+    'telemetry': {
+        '*': {
+            'rows': 'teleParam',
+            'row_fields': ['ts', 'flowRate', 'discharge', 'workHour', 'cummRevDisch', 'Data', 'CycleSlips', 'NoData', 'USS']
+        }
+    },
+    'error': {
+        '*': {
+            'rows': 'mspErrParam',
+            'row_fields': ['ts', 'err-code']
+        }
+    },
+    'pump': {
+        '*': {
+            'rows': 'pumpParam',
+            'row_fields': ['PumpStartTs', 'Startdischarge', 'StartData', 'StartNoData', 'StartCycleSlips',
+                           'PumpStoptTs', 'Stopdischarge', 'StopData', 'StopNoData', 'StopCycleSlips']
+        }
+    },
+    'diagnostic': {
+        '*': {
+            'fields': ['diagnosParam', 'commParam', 'storedDiagParams']
+        }
+    }
+}
+
+# Rows listed individually in an error message before the rest are summarized
+MAX_REPORTED_ROWS = 10
+
+
+class SchemaValidationError(ValueError):
+    """Raised with every problem found in a section, not just the first."""
+
+    def __init__(self, section, problems):
+        self.section = section
+        self.problems = problems
+        details = '; '.join(problems[:MAX_REPORTED_ROWS])
+        if len(problems) > MAX_REPORTED_ROWS:
+            details += f"; and {len(problems) - MAX_REPORTED_ROWS} more"
+        super().__init__(f"Invalid {section} section: {details}")
+
+
+class SectionValidator:
+    """Required-key checks for one (section, json-ver), compiled to frozensets."""
+
+    def __init__(self, section, schema):
+        self.section = section
+        self.fields = frozenset(COMMON_FIELDS).union(schema.get('fields', ()))
+        self.rows_key = schema.get('rows')
+        self.row_fields = frozenset(schema.get('row_fields', ()))
+
+    def problems(self, data, row_offset=0):
+        """Return a description of every missing field, or an empty list.
+
+        ``row_offset`` is added to reported row numbers when ``data`` holds a
+        slice of a larger section.
+        """
+        if not isinstance(data, dict):
+            return ["section must be an object"]
+        problems = []
+        if not data.keys() >= self.fields:
+            problems.append(f"missing required fields {sorted(self.fields.difference(data))}")
+
+        if self.rows_key is not None:
+            rows = data.get(self.rows_key)
+            if not isinstance(rows, list):
+                problems.append(f"'{self.rows_key}' must be a list")
+                return problems
+
+            row_fields = self.row_fields
+            for index, row in enumerate(rows, row_offset):
+                # Fast path: a key-set superset check per row
+                if not isinstance(row, dict):
+                    problems.append(f"row {index} is not an object")
+                elif not row.keys() >= row_fields:
+                    problems.append(f"row {index} missing {sorted(row_fields.difference(row))}")
+        return problems
+
+    def validate(self, data, row_offset=0):
+        problems = self.problems(data, row_offset)
+        if problems:
+            raise SchemaValidationError(self.section, problems)
+        return data
+
+
+@lru_cache(maxsize=256)
+def get_validator(section, json_ver='*'):
+    """Look up the compiled validator for a section and schema version.
+
+    Returns None for sections without a schema.
+    """
+    versions = SECTION_SCHEMAS.get(section)
+    if versions is None:
+        return None
+    schema = versions.get(json_ver, versions.get('*'))
+    return SectionValidator(section, schema)
+
+
+# Compile every configured validator at cold start
+for _section, _versions in SECTION_SCHEMAS.items():
+    for _json_ver in _versions:
+        get_validator(_section, _json_ver)
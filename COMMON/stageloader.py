@@ -0,0 +1,39 @@
+import importlib.util
+import os
+import sys
+import threading
+
+# Directory holding RECEIVE/, EXTRACT/ and TRANSFORMandLOAD/. Defaults to the
+# function's code directory on Lambda, or the repository root locally.
+STAGE_ROOT = (
+    os.environ.get('STAGE_ROOT')
+    or os.environ.get('LAMBDA_TASK_ROOT')
+    or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+_lock = threading.RLock()
+
+
+def load_stage(relative_path):
+    """Import a pipeline handler module by its path relative to STAGE_ROOT.
+
+    Handler files such as ``EXTRACT/telemetry-extract.py`` have hyphenated
+    names and cannot be imported with a plain ``import`` statement. Each file
+    is executed once per container and cached in ``sys.modules``.
+    """
+    module_name = 'stage_' + os.path.splitext(relative_path)[0].replace('/', '_').replace('-', '_')
+    with _lock:
+        module = sys.modules.get(module_name)
+        if module is None:
+            path = os.path.join(STAGE_ROOT, relative_path)
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            if spec is None:
+                raise ImportError(f"Cannot load pipeline stage from {path}")
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[module_name]
+                raise
+    return module
@@ -0,0 +1,132 @@
+import os
+from collections import namedtuple
+
+from codec import loads
+from coldstart import optional_module
+
+# SQS bodies at least this large are parsed incrementally. SQS caps a
+# message at 1 MiB (256 KiB on queues that have not raised the limit), so
+# this must stay well below that for streaming to ever run.
+STREAMING_MIN_BYTES = int(os.environ.get('STREAMING_MIN_BYTES', str(128 * 1024)))
+# Maximum number of samples handed downstream at a time
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', '5000'))
+
+# section -> key of its list of samples; other sections are yielded whole
+ROW_KEYS = {
+    'telemetry': 'teleParam',
+    'error': 'mspErrParam',
+    'pump': 'pumpParam'
+}
+
+# Header fields a chunk needs before it can be processed on its own
+HEADER_FIELDS = ('token', 'status', 'json-ver')
+
+# One bounded slice of a section. ``header`` holds the section's fields other
+# than its samples; ``rows`` is None for sections without a sample list.
+# ``offset`` is the index of the first row within the section and ``last``
+# marks the final chunk of the section.
+SectionChunk = namedtuple('SectionChunk', ['section', 'header', 'rows', 'offset', 'last'])
+
+
+def use_streaming(body):
+    return len(body) >= STREAMING_MIN_BYTES
+
+
+def iter_section_chunks(body, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield SectionChunks from a JSON payload (str or bytes).
+
+    With ijson installed, samples are parsed one at a time and at most
+    ``chunk_rows`` of them are held in memory, however many the device sent.
+    That bound needs the section's HEADER_FIELDS to come before its sample
+    list: a chunk cannot be validated without them, so samples that arrive
+    first are held until the header is complete and may form one large chunk.
+    """
+    # ijson is optional and only imported once an oversized body arrives;
+    # without it the body is parsed in one go
+    ijson = optional_module('ijson')
+    if ijson is None:
+        yield from _iter_parsed_chunks(loads(body), chunk_rows)
+        return
+
+    events = iter(ijson.parse(body, use_float=True))
+    for prefix, event, value in events:
+        if prefix == '' and event == 'map_key':
+            section = value
+            _, event, value = next(events)
+            if event == 'start_map':
+                yield from _stream_section(section, events, chunk_rows)
+            else:
+                _build_value(event, value, events)
+
+
+def _stream_section(section, events, chunk_rows):
+    row_key = ROW_KEYS.get(section)
+    header = {}
+    rows = []
+    offset = 0
+    has_rows = False
+
+    for prefix, event, value in events:
+        if event == 'end_map' and prefix == section:
+            break
+        # event is the map_key of one of the section's fields
+        key = value
+        _, event, value = next(events)
+        if key == row_key and event == 'start_array':
+            has_rows = True
+            for _, event, value in events:
+                if event == 'end_array':
+                    break
+                rows.append(_build_value(event, value, events))
+                if len(rows) >= chunk_rows and all(field in header for field in HEADER_FIELDS):
+                    yield SectionChunk(section, dict(header), rows, offset, False)
+                    offset += len(rows)
+                    rows = []
+        else:
+            header[key] = _build_value(event, value, events)
+
+    if has_rows:
+        yield SectionChunk(section, header, rows, offset, True)
+    else:
+        # No sample list (or a malformed one, left in the header for validation)
+        yield SectionChunk(section, header, None, 0, True)
+
+
+def _build_value(event, value, events):
+    # Consume the events of one JSON value and return it as a Python object
+    if event not in ('start_map', 'start_array'):
+        return value
+    builder = optional_module('ijson.common').ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    while depth:
+        _, event, value = next(events)
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+    return builder.value
+
+
+def _iter_parsed_chunks(message, chunk_rows):
+    for section, section_data in message.items():
+        if not isinstance(section_data, dict):
+            continue
+        row_key = ROW_KEYS.get(section)
+        rows = section_data.get(row_key) if row_key else None
+        if not isinstance(rows, list):
+            yield SectionChunk(section, section_data, None, 0, True)
+            continue
+        header = {key: value for key, value in section_data.items() if key != row_key}
+        for offset in range(0, max(len(rows), 1), chunk_rows):
+            yield SectionChunk(section, header, rows[offset:offset + chunk_rows], offset, offset + chunk_rows >= len(rows))
+
+
+def chunk_section_data(chunk):
+    """The chunk as a regular section dict, for the existing section functions."""
+    if chunk.rows is None:
+        return chunk.header
+    section_data = dict(chunk.header)
+    section_data[ROW_KEYS[chunk.section]] = chunk.rows
+    return section_data
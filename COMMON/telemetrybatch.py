@@ -0,0 +1,124 @@
+import os
+from operator import itemgetter
+
+from coldstart import module_available, optional_module
+from timestamps import convert_ms_many, to_db_timestamp
+
+# Messages with at least this many samples are transformed column-wise
+TELEMETRY_COLUMNAR_MIN_ROWS = int(os.environ.get('TELEMETRY_COLUMNAR_MIN_ROWS', '256'))
+
+# (teleParam field, telemetry_data column, dtype)
+TELEMETRY_FIELDS = (
+    ('flowRate', 'flow_rate', 'float64'),
+    ('discharge', 'discharge', 'int64'),
+    ('workHour', 'work_hours', 'int64'),
+    ('cummRevDisch', 'cumulative_reverse_discharge', 'int64'),
+    ('Data', 'data_count', 'int64'),
+    ('CycleSlips', 'cycle_slips', 'int64'),
+    ('NoData', 'no_data_count', 'int64'),
+    ('USS', 'uss', 'int64')
+)
+
+# telemetry_data columns, in COPY/INSERT order
+TELEMETRY_COLUMNS = ('token', 'timestamp') + tuple(column for _, column, _ in TELEMETRY_FIELDS)
+
+_read_fields = itemgetter('ts', *(field for field, _, _ in TELEMETRY_FIELDS))
+# Matrix columns read by _read_fields that must hold whole numbers
+_INTEGER_INDEXES = [0] + [index + 1 for index, (_, _, dtype) in enumerate(TELEMETRY_FIELDS) if dtype == 'int64']
+
+
+def columnar_available(sample_count):
+    # numpy is optional and only imported once a batch is large enough;
+    # without it callers fall back to per-row dicts
+    return sample_count >= TELEMETRY_COLUMNAR_MIN_ROWS and module_available('numpy')
+
+
+class TelemetryBatch:
+    """Telemetry samples for one device held as one array per column.
+
+    ``timestamps`` holds epoch milliseconds, or the converted timestamps of
+    a batch rebuilt by ``from_dict``; ``columns`` maps telemetry_data column
+    names to arrays (numpy arrays or plain lists) of equal length.
+    """
+
+    def __init__(self, token, status, json_ver, timestamps, columns):
+        self.token = token
+        self.status = status
+        self.json_ver = json_ver
+        self.timestamps = timestamps
+        self.columns = columns
+
+    @classmethod
+    def from_tele_params(cls, telemetry_data):
+        """Build a batch from a raw telemetry section in a single pass over teleParam.
+
+        Returns None when a value cannot be stored exactly in its column (a
+        null, a non-numeric value, or a fractional or oversized integer), so
+        the caller can fall back to the per-row path, which passes values
+        through unchanged.
+        """
+        np = optional_module('numpy')
+        params = telemetry_data['teleParam']
+        try:
+            # None becomes NaN and is rejected below
+            matrix = np.array(list(map(_read_fields, params)), dtype=np.float64).reshape(len(params), len(TELEMETRY_FIELDS) + 1)
+        except (TypeError, ValueError):
+            return None
+
+        if not np.isfinite(matrix).all():
+            return None
+        integers = matrix[:, _INTEGER_INDEXES]
+        # float64 holds integers exactly only below 2**53
+        if not ((integers == np.trunc(integers)).all() and (np.abs(integers) < 2 ** 53).all()):
+            return None
+
+        columns = {
+            column: matrix[:, index + 1].astype(dtype)
+            for index, (_, column, dtype) in enumerate(TELEMETRY_FIELDS)
+        }
+        return cls(
+            telemetry_data.get('token'),
+            telemetry_data.get('status'),
+            telemetry_data.get('json-ver'),
+            matrix[:, 0].astype(np.int64),
+            columns
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a batch from the output of ``to_dict``."""
+        columns = dict(data['columns'])
+        return cls(data.get('token'), data.get('status'), data.get('json_ver'), columns['timestamp'], columns)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __repr__(self):
+        return f"TelemetryBatch(token={self.token!r}, rows={len(self)})"
+
+    def to_dict(self):
+        """Columnar, JSON-serializable form passed from the extract to the load stage."""
+        # Only the converted timestamps are sent; the loader never reads epoch ms
+        columns = {'timestamp': convert_ms_many(self.timestamps)}
+        columns.update((name, _tolist(values)) for name, values in self.columns.items())
+        return {
+            'token': self.token,
+            'status': self.status,
+            'json_ver': self.json_ver,
+            'columns': columns
+        }
+
+    def rows(self):
+        """Yield tuples in TELEMETRY_COLUMNS order for the COPY/batched loaders."""
+        timestamps = self.columns.get('timestamp')
+        if timestamps is None:
+            timestamps = convert_ms_many(self.timestamps)
+        timestamps = map(to_db_timestamp, timestamps)
+        tokens = [self.token] * len(self)
+        values = [_tolist(self.columns[column]) for column in TELEMETRY_COLUMNS[2:]]
+        return zip(tokens, timestamps, *values)
+
+
+def _tolist(values):
+    # psycopg2 cannot adapt numpy scalars, so hand out native Python values
+    return values.tolist() if hasattr(values, 'tolist') else values
@@ -0,0 +1,69 @@
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from coldstart import optional_module
+
+# How extractors emit device timestamps:
+#   'iso'      - ISO 8601 strings in UTC (default)
+#   'epoch_ms' - the device's epoch milliseconds, unchanged
+#   'datetime' - timezone-aware datetime objects (fused pipeline only; not JSON-serializable)
+# Loaders accept all three.
+TIMESTAMP_FORMAT = os.environ.get('TIMESTAMP_FORMAT', 'iso')
+
+_ISO_SUFFIX = '+00:00'
+
+
+@lru_cache(maxsize=4096)
+def _second_prefix(second):
+    # Samples from one message share a handful of seconds, so this is mostly cache hits
+    return datetime.fromtimestamp(second, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def epoch_ms_to_iso(ts):
+    """Epoch milliseconds to an ISO 8601 UTC string, e.g. 2024-11-22T05:30:51.768000+00:00."""
+    second, millis = divmod(int(ts), 1000)
+    return f"{_second_prefix(second)}.{millis:03d}000{_ISO_SUFFIX}"
+
+
+def epoch_ms_to_iso_many(values):
+    """Vectorized ``epoch_ms_to_iso`` for a list or array of epoch milliseconds."""
+    # numpy is optional and imported on first use; without it batches take the memoized scalar path
+    np = optional_module('numpy')
+    if np is None:
+        return [epoch_ms_to_iso(ts) for ts in values]
+    strings = np.datetime_as_string(np.asarray(values, dtype='int64').astype('datetime64[ms]'), unit='us')
+    return np.char.add(strings, _ISO_SUFFIX).tolist()
+
+
+def epoch_ms_to_datetime(ts):
+    return datetime.fromtimestamp(ts / 1000, timezone.utc)
+
+
+def convert_ms(ts):
+    """Convert a device timestamp according to TIMESTAMP_FORMAT."""
+    if TIMESTAMP_FORMAT == 'epoch_ms':
+        return ts
+    if TIMESTAMP_FORMAT == 'datetime':
+        return epoch_ms_to_datetime(ts)
+    return epoch_ms_to_iso(ts)
+
+
+def convert_ms_many(values):
+    """Convert an array of device timestamps according to TIMESTAMP_FORMAT."""
+    if TIMESTAMP_FORMAT == 'epoch_ms':
+        return values.tolist() if hasattr(values, 'tolist') else list(values)
+    if TIMESTAMP_FORMAT == 'datetime':
+        return [epoch_ms_to_datetime(ts) for ts in values]
+    return epoch_ms_to_iso_many(values)
+
+
+def to_db_timestamp(value):
+    """Prepare an extracted timestamp for psycopg2 or COPY.
+
+    ISO strings and datetimes pass through; epoch milliseconds become
+    timezone-aware datetimes.
+    """
+    if isinstance(value, (int, float)):
+        return epoch_ms_to_datetime(value)
+    return value
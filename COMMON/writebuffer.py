@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import psycopg2
+from dbpool import db_pool
+from metrics import timer
+from pipelinelog import get_logger
+
+# Set up logging
+logger = get_logger('writebuffer')
+
+# Flush once this many rows are pending across all sections
+WRITE_BUFFER_MAX_ROWS = int(os.environ.get('WRITE_BUFFER_MAX_ROWS', '5000'))
+# Flush once the buffered messages add up to this many bytes
+WRITE_BUFFER_MAX_BYTES = int(os.environ.get('WRITE_BUFFER_MAX_BYTES', str(5 * 1024 * 1024)))
+# Flush once the oldest buffered message has waited this long (milliseconds)
+WRITE_BUFFER_MAX_AGE_MS = float(os.environ.get('WRITE_BUFFER_MAX_AGE_MS', '1000'))
+
+# Outcome of one flush. ``acked`` and ``failed`` hold the ack ids of the
+# messages that were committed and of those that were not.
+FlushResult = namedtuple('FlushResult', ['acked', 'failed', 'rows', 'duration_ms', 'reason'])
+
+_Entry = namedtuple('_Entry', ['ack_id', 'sections', 'rows', 'nbytes'])
+
+
+def _row_count(data):
+    # Lists and TelemetryBatch count their rows; a diagnostic record is one row
+    return len(data) if hasattr(data, '__len__') and not isinstance(data, dict) else 1
+
+
+class WriteBuffer:
+    """Gathers formatted sections from many messages and writes them together.
+
+    ``write_section(cur, section, data)`` writes one section without
+    committing. A flush writes every buffered message in one transaction and
+    reports a message as acked only after that transaction has committed, so
+    a message must not be deleted from its queue before then. If the
+    transaction fails, each message is retried in its own transaction and
+    only those that still fail are reported as failed.
+    """
+
+    def __init__(self, write_section, max_rows=WRITE_BUFFER_MAX_ROWS,
+                 max_bytes=WRITE_BUFFER_MAX_BYTES, max_age_ms=WRITE_BUFFER_MAX_AGE_MS):
+        self.write_section = write_section
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age_ms = max_age_ms
+        self._entries = []
+        self._rows = 0
+        self._bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._metrics = {
+            'flushes': 0,
+            'flush_failures': 0,
+            'messages_flushed': 0,
+            'rows_flushed': 0,
+            'last_batch_messages': 0,
+            'last_batch_rows': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'flush_reasons': {}
+        }
+
+    def add(self, ack_id, sections, nbytes=0):
+        """Buffer one message's formatted sections.
+
+        Returns the FlushResult if this message triggered a flush, else None.
+        """
+        rows = sum(_row_count(data) for data in sections.values())
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._entries.append(_Entry(ack_id, sections, rows, nbytes))
+            self._rows += rows
+            self._bytes += nbytes
+            if self._rows >= self.max_rows:
+                reason = 'rows'
+            elif self._bytes >= self.max_bytes:
+                reason = 'bytes'
+            else:
+                return None
+        return self.flush(reason)
+
+    def age_ms(self):
+        with self._lock:
+            return 0.0 if self._oldest is None else (time.monotonic() - self._oldest) * 1000
+
+    def flush_due(self):
+        """Flush if the oldest message has waited at least ``max_age_ms``."""
+        if self._entries and self.age_ms() >= self.max_age_ms:
+            return self.flush('age')
+        return None
+
+    def flush(self, reason='manual'):
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+                self._rows = 0
+                self._bytes = 0
+                self._oldest = None
+            if not entries:
+                return FlushResult([], [], 0, 0.0, reason)
+
+            start = time.perf_counter()
+            try:
+                rows = self._write(entries)
+                acked, failed = [entry.ack_id for entry in entries], []
+            except (Exception, psycopg2.Error) as error:
+                logger.error(f"Error flushing {len(entries)} buffered messages, retrying one at a time: {error}")
+                acked, failed, rows = self._write_singly(entries)
+            duration_ms = (time.perf_counter() - start) * 1000
+
+            self._record(len(acked), rows, duration_ms, reason, failed)
+            logger.info(
+                f"Flushed write buffer: reason={reason} messages={len(acked)} rows={rows} "
+                f"failed={len(failed)} duration_ms={duration_ms:.2f}"
+            )
+            return FlushResult(acked, failed, rows, duration_ms, reason)
+
+    def metrics(self):
+        """Flush counters plus the current queue depth."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['flush_reasons'] = dict(self._metrics['flush_reasons'])
+            metrics['pending_messages'] = len(self._entries)
+            metrics['pending_rows'] = self._rows
+            metrics['pending_bytes'] = self._bytes
+            metrics['oldest_age_ms'] = 0.0 if self._oldest is None else (time.monotonic() - self._oldest) * 1000
+        return metrics
+
+    def _write(self, entries):
+        # Same-shaped sections are merged so each table gets one bulk write
+        merged = {}
+        for entry in entries:
+            for section, data in entry.sections.items():
+                merged.setdefault(section, []).append(data)
+
+        rows = 0
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            with timer('db_execute'):
+                for section, parts in merged.items():
+                    if all(isinstance(part, list) for part in parts):
+                        parts = [[row for part in parts for row in part]]
+                    for part in parts:
+                        self.write_section(cur, section, part)
+                        rows += _row_count(part)
+            with timer('db_commit'):
+                conn.commit()
+        return rows
+
+    def _write_singly(self, entries):
+        acked, failed, rows = [], [], 0
+        for entry in entries:
+            try:
+                rows += self._write([entry])
+                acked.append(entry.ack_id)
+            except (Exception, psycopg2.Error) as error:
+                logger.error(f"Error writing buffered message {entry.ack_id}: {error}")
+                failed.append(entry.ack_id)
+        return acked, failed, rows
+
+    def _record(self, messages, rows, duration_ms, reason, failed):
+        with self._lock:
+            metrics = self._metrics
+            metrics['flushes'] += 1
+            metrics['flush_failures'] += 1 if failed else 0
+            metrics['messages_flushed'] += messages
+            metrics['rows_flushed'] += rows
+            metrics['last_batch_messages'] = messages
+            metrics['last_batch_rows'] = rows
+            metrics['last_flush_ms'] = duration_ms
+            metrics['max_flush_ms'] = max(metrics['max_flush_ms'], duration_ms)
+            metrics['flush_reasons'][reason] = metrics['flush_reasons'].get(reason, 0) + 1
@@ -1,23 +1,24 @@
 import json
 import logging
 from datetime import datetime
+from codec import dumps, encode_body, parse_event_body
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from timestamps import convert_ms
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger('diagnostic-extract')
 
+@instrumented('diagnostic-extract')
 def lambda_handler(event, context):
     logger.info("Diagnostic Data Extractor Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract processed_data
         if 'processed_data' in body:
@@ -28,31 +29,34 @@ def lambda_handler(event, context):
         # Extract diagnostic data
         if 'diagnostic' in processed_data:
             diagnostic_data = processed_data['diagnostic']
-            logger.info(f"Extracted diagnostic data: {json.dumps(diagnostic_data, indent=2)}")
+            log_payload(logger, "Extracted diagnostic data", diagnostic_data)
         else:
             raise ValueError("Diagnostic data not found in the input")
 
         # Process diagnostic data
-        processed_diagnostic = process_diagnostic(diagnostic_data)
+        count('rows', 1)
+        with timer('transform'):
+            processed_diagnostic = process_diagnostic(diagnostic_data)
 
         # Prepare the output
         output = {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': encode_body({
                 'diagnostic': processed_diagnostic,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
-            })
+            }, 'diagnostic-extract/v1')
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing diagnostic data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
+                'section': 'diagnostic',
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
@@ -66,13 +70,13 @@ def process_diagnostic(diagnostic_data):
         'token': diagnostic_data.get('token'),
         'status': diagnostic_data.get('status'),
         'json_ver': diagnostic_data.get('json-ver'),
-        'timestamp': datetime.fromtimestamp(diagnostic_data['ts'] / 1000).isoformat(),
+        'timestamp': convert_ms(diagnostic_data['ts']),
         'diagnosParam': process_diagnos_param(diagnostic_data.get('diagnosParam', {})),
         'commParam': process_comm_param(diagnostic_data.get('commParam', {})),
         'storedDiagParams': process_stored_diag_params(diagnostic_data.get('storedDiagParams', {}))
     }
 
-    logger.info(f"Processed diagnostic data: {json.dumps(processed_data, indent=2)}")
+    log_payload(logger, "Processed diagnostic data", processed_data, logging.DEBUG)
     return processed_data
 
 def process_diagnos_param(diagnos_param):
@@ -85,7 +89,7 @@ def process_diagnos_param(diagnos_param):
         'vBatonLoad': diagnos_param.get('vBatonLoad'),
         'vSuperCap': diagnos_param.get('vSuperCap')
     }
-    logger.info(f"Processed diagnosParam: {json.dumps(processed, indent=2)}")
+    log_payload(logger, "Processed diagnosParam", processed, logging.DEBUG)
     return processed
 
 def process_comm_param(comm_param):
@@ -95,7 +99,7 @@ def process_comm_param(comm_param):
         'ntpTime': comm_param.get('ntpTime'),
         'serverCmdsTime': comm_param.get('serverCmdsTime')
     }
-    logger.info(f"Processed commParam: {json.dumps(processed, indent=2)}")
+    log_payload(logger, "Processed commParam", processed, logging.DEBUG)
     return processed
 
 def process_stored_diag_params(stored_diag_params):
@@ -112,7 +116,7 @@ def process_stored_diag_params(stored_diag_params):
             'vBatonLoad': value.get('vBatonLoad'),
             'vSuperCap': value.get('vSuperCap')
         }
-    logger.info(f"Processed storedDiagParams: {json.dumps(processed, indent=2)}")
+    log_payload(logger, "Processed storedDiagParams", processed, logging.DEBUG)
     return processed
 
 # For local testing
@@ -1,23 +1,29 @@
 import json
 import logging
 from datetime import datetime
+from codec import dumps, encode_body, parse_event_body
+from coldstart import run_at_init
+from errorcatalog import ERROR_CATALOG_VERSION, get_catalog
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from timestamps import convert_ms
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger('error-extract')
 
+# Every invocation looks codes up, so read the catalog during init
+run_at_init('error_catalog', get_catalog)
+
+@instrumented('error-extract')
 def lambda_handler(event, context):
     logger.info("Error Data Extractor Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract processed_data
         if 'processed_data' in body:
@@ -28,38 +34,41 @@ def lambda_handler(event, context):
         # Extract error data
         if 'error' in processed_data:
             error_data = processed_data['error']
-            logger.info(f"Extracted error data: {json.dumps(error_data, indent=2)}")
+            log_payload(logger, "Extracted error data", error_data)
         else:
             raise ValueError("Error data not found in the input")
 
-        # Process error data
-        processed_error = process_error(error_data)
+        # Process error data, optionally against a newer catalog version
+        count('rows', len(error_data.get('mspErrParam') or ()))
+        with timer('transform'):
+            processed_error = process_error(error_data, body.get('error_catalog_version', ERROR_CATALOG_VERSION))
 
         # Prepare the output
         output = {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': encode_body({
                 'error': processed_error,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
-            })
+            }, 'error-extract/v1')
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing error data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
+                'section': 'error',
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
             })
         }
 
-def process_error(error_data):
+def process_error(error_data, catalog_version=ERROR_CATALOG_VERSION):
     logger.info("Processing error data")
 
     processed_data = {
@@ -70,28 +79,27 @@ def process_error(error_data):
     }
 
     if 'mspErrParam' in error_data and isinstance(error_data['mspErrParam'], list):
-        for param in error_data['mspErrParam']:
+        params = error_data['mspErrParam']
+        # Resolve all codes against the catalog in one call
+        error_infos = get_catalog(catalog_version).lookup_many([param['err-code'] for param in params])
+        for param, error_info in zip(params, error_infos):
             processed_error = {
-                'timestamp': datetime.fromtimestamp(param['ts'] / 1000).isoformat(),
+                'timestamp': convert_ms(param['ts']),
                 'error_code': param['err-code'],
-                'error_description': get_error_description(param['err-code'])
+                'error_description': error_info.description,
+                'error_category_id': error_info.category_id,
+                'severity': error_info.severity
             }
             processed_data['errors'].append(processed_error)
-            logger.info(f"Processed error parameter: {json.dumps(processed_error, indent=2)}")
+            log_payload(logger, "Processed error parameter", processed_error, logging.DEBUG)
     else:
         logger.warning("No mspErrParam found in error data or invalid format")
 
     return processed_data
 
 def get_error_description(error_code):
-    # This is a placeholder function. In a real-world scenario, you would have a more comprehensive
-    # mapping of error codes to descriptions.
-    error_descriptions = {
-        127: "General system error",
-        175: "Communication failure",
-        # Add more error codes and descriptions as needed
-    }
-    return error_descriptions.get(error_code, "Unknown error")
+    # Descriptions come from the error catalog (COMMON/errorcatalog.json)
+    return get_catalog().lookup(error_code).description
 
 # For local testing
 if __name__ == "__main__":
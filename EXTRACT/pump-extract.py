@@ -1,23 +1,24 @@
 import json
 import logging
 from datetime import datetime
+from codec import dumps, encode_body, parse_event_body
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from timestamps import convert_ms
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger('pump-extract')
 
+@instrumented('pump-extract')
 def lambda_handler(event, context):
     logger.info("Pump Data Extractor Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract processed_data
         if 'processed_data' in body:
@@ -28,31 +29,34 @@ def lambda_handler(event, context):
         # Extract pump data
         if 'pump' in processed_data:
             pump_data = processed_data['pump']
-            logger.info(f"Extracted pump data: {json.dumps(pump_data, indent=2)}")
+            log_payload(logger, "Extracted pump data", pump_data)
         else:
             raise ValueError("Pump data not found in the input")
 
         # Process pump data
-        processed_pump = process_pump(pump_data)
+        count('rows', len(pump_data.get('pumpParam') or ()))
+        with timer('transform'):
+            processed_pump = process_pump(pump_data)
 
         # Prepare the output
         output = {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': encode_body({
                 'pump': processed_pump,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
-            })
+            }, 'pump-extract/v1')
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing pump data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
+                'section': 'pump',
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
@@ -72,12 +76,12 @@ def process_pump(pump_data):
     if 'pumpParam' in pump_data and isinstance(pump_data['pumpParam'], list):
         for param in pump_data['pumpParam']:
             processed_param = {
-                'pump_start_time': datetime.fromtimestamp(param['PumpStartTs'] / 1000).isoformat(),
+                'pump_start_time': convert_ms(param['PumpStartTs']),
                 'start_discharge': param['Startdischarge'],
                 'start_data': param['StartData'],
                 'start_no_data': param['StartNoData'],
                 'start_cycle_slips': param['StartCycleSlips'],
-                'pump_stop_time': datetime.fromtimestamp(param['PumpStoptTs'] / 1000).isoformat(),
+                'pump_stop_time': convert_ms(param['PumpStoptTs']),
                 'stop_discharge': param['Stopdischarge'],
                 'stop_data': param['StopData'],
                 'stop_no_data': param['StopNoData'],
@@ -89,7 +93,7 @@ def process_pump(pump_data):
                 'cycle_slips_difference': param['StopCycleSlips'] - param['StartCycleSlips']
             }
             processed_data['params'].append(processed_param)
-            logger.info(f"Processed pump parameter: {json.dumps(processed_param, indent=2)}")
+            log_payload(logger, "Processed pump parameter", processed_param, logging.DEBUG)
     else:
         logger.warning("No pumpParam found in pump data or invalid format")
 
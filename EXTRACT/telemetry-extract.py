@@ -1,23 +1,25 @@
 import json
 import logging
 from datetime import datetime
+from codec import dumps, encode_body, parse_event_body
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from telemetrybatch import TelemetryBatch, columnar_available
+from timestamps import convert_ms
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger('telemetry-extract')
 
+@instrumented('telemetry-extract')
 def lambda_handler(event, context):
     logger.info("Telemetry Extractor Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract processed_data
         if 'processed_data' in body:
@@ -28,31 +30,34 @@ def lambda_handler(event, context):
         # Extract telemetry data
         if 'telemetry' in processed_data:
             telemetry_data = processed_data['telemetry']
-            logger.info(f"Extracted telemetry data: {json.dumps(telemetry_data, indent=2)}")
+            log_payload(logger, "Extracted telemetry data", telemetry_data)
         else:
             raise ValueError("Telemetry data not found in the input")
 
         # Process telemetry data
-        processed_telemetry = process_telemetry(telemetry_data)
+        count('rows', len(telemetry_data.get('teleParam') or ()))
+        with timer('transform'):
+            processed_telemetry = process_telemetry(telemetry_data)
 
         # Prepare the output
         output = {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': encode_body({
                 'telemetry': processed_telemetry,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
-            })
+            }, 'telemetry-extract/v1')
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing telemetry data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
+                'section': 'telemetry',
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
@@ -70,9 +75,18 @@ def process_telemetry(telemetry_data):
     }
 
     if 'teleParam' in telemetry_data and isinstance(telemetry_data['teleParam'], list):
+        if columnar_available(len(telemetry_data['teleParam'])):
+            # Large buffered uploads are transformed column-wise, unless a
+            # value would not survive the int64/float64 columns
+            batch = TelemetryBatch.from_tele_params(telemetry_data)
+            if batch is not None:
+                logger.info(f"Processed {len(batch)} telemetry samples column-wise")
+                return batch.to_dict()
+            logger.info("Telemetry samples hold nulls or non-integral counters; processing them per row")
+
         for param in telemetry_data['teleParam']:
             processed_param = {
-                'timestamp': datetime.fromtimestamp(param['ts'] / 1000).isoformat(),
+                'timestamp': convert_ms(param['ts']),
                 'flow_rate': param['flowRate'],
                 'discharge': param['discharge'],
                 'work_hours': param['workHour'],
@@ -83,7 +97,7 @@ def process_telemetry(telemetry_data):
                 'uss': param['USS']
             }
             processed_data['params'].append(processed_param)
-            logger.info(f"Processed telemetry parameter: {json.dumps(processed_param, indent=2)}")
+            log_payload(logger, "Processed telemetry parameter", processed_param, logging.DEBUG)
     else:
         logger.warning("No teleParam found in telemetry data or invalid format")
 
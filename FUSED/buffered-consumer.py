@@ -0,0 +1,82 @@
+import math
+import os
+import signal
+import boto3
+from codec import loads
+from stageloader import load_stage
+from pipelinelog import get_logger
+
+# Set up logging
+logger = get_logger('consumer')
+
+# Queue the devices' payloads arrive on
+SQS_QUEUE_URL = os.environ.get('SQS_QUEUE_URL')
+# Longest wait of one receive call (seconds, at most 20)
+SQS_WAIT_SECONDS = int(os.environ.get('SQS_WAIT_SECONDS', '20'))
+
+# Validation, extraction and formatting are shared with the fused Lambda
+fused = load_stage('FUSED/fused-pipeline.py')
+write_buffer = fused.write_buffer
+
+sqs = boto3.client('sqs')
+_running = True
+
+def run():
+    """Poll SQS until SIGTERM, loading messages through the write buffer.
+
+    Unlike the Lambda, this process outlives any single receive, so the
+    buffer fills across many of them and is flushed on row count, byte size
+    or age. A message is deleted from the queue only after the flush that
+    wrote it has committed; anything else becomes visible again after the
+    queue's visibility timeout, which must exceed WRITE_BUFFER_MAX_AGE_MS.
+    """
+    signal.signal(signal.SIGTERM, _stop)
+    logger.info(f"Buffered consumer started on {SQS_QUEUE_URL}")
+
+    while _running:
+        # Wake up in time for the oldest buffered message's age limit. SQS
+        # waits in whole seconds, and a 0-second short poll would spin (and
+        # be billed) until the limit passes, so the wait is rounded up and
+        # never below 1 second; a flush can run up to 1 second late.
+        age_ms = write_buffer.age_ms()
+        wait_seconds = (write_buffer.max_age_ms - age_ms) / 1000 if age_ms else SQS_WAIT_SECONDS
+        response = sqs.receive_message(
+            QueueUrl=SQS_QUEUE_URL,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=max(1, min(SQS_WAIT_SECONDS, math.ceil(wait_seconds)))
+        )
+
+        for message in response.get('Messages', []):
+            try:
+                formatted, _ = fused.prepare_sections(loads(message['Body']))
+            except Exception as e:
+                # Left on the queue; the redrive policy moves it to the DLQ
+                logger.error(f"Error processing SQS message {message['MessageId']}: {str(e)}")
+                continue
+            acknowledge(write_buffer.add(message['ReceiptHandle'], formatted, len(message['Body'])))
+
+        acknowledge(write_buffer.flush_due())
+
+    acknowledge(write_buffer.flush('shutdown'))
+    logger.info(f"Buffered consumer stopped: {write_buffer.metrics()}")
+
+def acknowledge(flush):
+    """Delete the messages of a committed flush from the queue."""
+    if flush is None or not flush.acked:
+        return
+    for start in range(0, len(flush.acked), 10):
+        entries = [
+            {'Id': str(index), 'ReceiptHandle': receipt_handle}
+            for index, receipt_handle in enumerate(flush.acked[start:start + 10])
+        ]
+        response = sqs.delete_message_batch(QueueUrl=SQS_QUEUE_URL, Entries=entries)
+        for failure in response.get('Failed', []):
+            logger.error(f"Failed to delete SQS message: {failure}")
+    logger.info(f"Write buffer metrics: {write_buffer.metrics()}")
+
+def _stop(signum, frame):
+    global _running
+    _running = False
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,261 @@
+import json
+import os
+import time
+from datetime import datetime
+from codec import dumps, loads, unwrap
+from dbpool import db_pool
+from metrics import count, instrumented, timer
+from stageloader import STAGE_ROOT, load_stage
+from streamingest import iter_section_chunks, use_streaming
+from pipelinelog import get_logger
+from writebuffer import WriteBuffer
+
+# Set up logging
+logger = get_logger('fused')
+
+# The step-by-step handlers, reused in-process
+receiver = load_stage('RECEIVE/payloadreceiver.py')
+multisection = load_stage('TRANSFORMandLOAD/multisection-transformandinsert.py')
+
+# Write the messages of an SQS batch together, in one transaction per flush
+FUSED_WRITE_BUFFER = os.environ.get('FUSED_WRITE_BUFFER', 'false').lower() == 'true'
+
+# section -> (extractor module, extract function, loader module, format function)
+SECTION_STAGES = {
+    'telemetry': (
+        load_stage('EXTRACT/telemetry-extract.py'), 'process_telemetry',
+        load_stage('TRANSFORMandLOAD/telemetry-transformandinsert.py'), 'format_telemetry_data'
+    ),
+    'error': (
+        load_stage('EXTRACT/error-extract.py'), 'process_error',
+        load_stage('TRANSFORMandLOAD/error-transformandinsert.py'), 'format_error_data'
+    ),
+    'pump': (
+        load_stage('EXTRACT/pump-extract.py'), 'process_pump',
+        load_stage('TRANSFORMandLOAD/pump-transformandinsert.py'), 'format_pump_data'
+    ),
+    'diagnostic': (
+        load_stage('EXTRACT/diagnostic-extract.py'), 'process_diagnostic',
+        load_stage('TRANSFORMandLOAD/diagnostic-transformandinsert.py'), 'format_diagnostic_data'
+    )
+}
+
+write_buffer = WriteBuffer(multisection.write_section)
+
+@instrumented('fused')
+def lambda_handler(event, context):
+    logger.info("Fused Pipeline Lambda function started")
+
+    # Check if the event is from SQS or direct JSON input
+    if 'Records' in event and len(event['Records']) > 0:
+        return process_batch(event['Records'])
+
+    try:
+        result = run_pipeline(unwrap(event))
+        return {
+            'statusCode': 200,
+            'body': dumps({
+                'message': 'Payload processed and inserted successfully',
+                'result': result,
+                'timestamp': datetime.utcnow().isoformat(),
+                'status': 'success'
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Error processing payload: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': dumps({
+                'error': str(e),
+                'timestamp': datetime.utcnow().isoformat(),
+                'status': 'error'
+            })
+        }
+
+def process_batch(records):
+    if FUSED_WRITE_BUFFER:
+        return process_batch_buffered(records)
+
+    batch_start = time.perf_counter()
+    results = []
+    batch_item_failures = []
+
+    count('messages', len(records))
+    for record in records:
+        message_id = record.get('messageId')
+        try:
+            body = record['body']
+            count('payload_bytes', len(body.encode('utf-8')))
+            if use_streaming(body):
+                # Oversized bodies are loaded chunk by chunk in one transaction
+                result = run_pipeline_stream(body)
+            else:
+                with timer('parse'):
+                    message = loads(body)
+                result = run_pipeline(unwrap(message))
+            results.append({'messageId': message_id, 'result': result})
+        except Exception as e:
+            logger.error(f"Error processing SQS message {message_id}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': message_id})
+
+    elapsed = time.perf_counter() - batch_start
+    logger.info(
+        f"Processed SQS batch: size={len(records)} succeeded={len(results)} "
+        f"failed={len(batch_item_failures)} duration_ms={elapsed * 1000:.2f}"
+    )
+
+    return {
+        'statusCode': 200,
+        'body': dumps({
+            'results': results,
+            'timestamp': datetime.utcnow().isoformat(),
+            'status': 'partial' if batch_item_failures else 'success'
+        }),
+        'batchItemFailures': batch_item_failures
+    }
+
+def process_batch_buffered(records):
+    """Like ``process_batch``, but commits many messages per transaction.
+
+    Messages are reported as processed only once the flush that wrote them
+    has committed; everything else is returned in ``batchItemFailures`` so
+    SQS delivers it again. The buffer is always flushed before returning,
+    because SQS deletes the batch as soon as the invocation succeeds.
+    """
+    batch_start = time.perf_counter()
+    results = {}
+    batch_item_failures = []
+    flushes = []
+
+    count('messages', len(records))
+    for record in records:
+        message_id = record.get('messageId')
+        try:
+            body = record['body']
+            count('payload_bytes', len(body.encode('utf-8')))
+            if use_streaming(body):
+                # Oversized bodies get a transaction of their own, bypassing the buffer
+                results[message_id] = run_pipeline_stream(body)
+                continue
+            with timer('parse'):
+                message = loads(body)
+            formatted, anomalies = prepare_sections(unwrap(message))
+        except Exception as e:
+            logger.error(f"Error processing SQS message {message_id}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': message_id})
+            continue
+
+        results[message_id] = {'anomalies': anomalies}
+        flush = write_buffer.add(message_id, formatted, len(body))
+        if flush is not None:
+            flushes.append(flush)
+
+    flushes.append(write_buffer.flush('end_of_batch'))
+    for flush in flushes:
+        for message_id in flush.failed:
+            results.pop(message_id, None)
+            batch_item_failures.append({'itemIdentifier': message_id})
+
+    elapsed = time.perf_counter() - batch_start
+    logger.info(
+        f"Processed SQS batch: size={len(records)} succeeded={len(results)} "
+        f"failed={len(batch_item_failures)} flushes={len(flushes)} duration_ms={elapsed * 1000:.2f}"
+    )
+    logger.info(f"Write buffer metrics: {write_buffer.metrics()}")
+
+    return {
+        'statusCode': 200,
+        'body': dumps({
+            'results': [{'messageId': message_id, 'result': result} for message_id, result in results.items()],
+            'timestamp': datetime.utcnow().isoformat(),
+            'status': 'partial' if batch_item_failures else 'success'
+        }),
+        'batchItemFailures': batch_item_failures
+    }
+
+def prepare_sections(message):
+    """Validate and extract one payload and format every section for loading.
+
+    Returns ``(formatted, anomalies)``.
+    """
+    processed_data = receiver.process_message(message)
+
+    formatted = {}
+    for section, (extractor, extract_name, loader, format_name) in SECTION_STAGES.items():
+        if section not in processed_data:
+            continue
+        with timer('extract'):
+            extracted = getattr(extractor, extract_name)(processed_data[section])
+        with timer('transform'):
+            formatted[section] = getattr(loader, format_name)(extracted)
+    return formatted, processed_data.get('anomalies', [])
+
+def run_pipeline(message):
+    """Validate, extract and load one payload on native Python objects.
+
+    Runs the same functions as the receiver, extract and load lambdas, but
+    passes their results directly instead of through JSON ``body`` strings.
+    """
+    start = time.perf_counter()
+    formatted, anomalies = prepare_sections(message)
+
+    # All sections are written at once (see MULTI_LOAD_TRANSACTION)
+    insert_results, errors = multisection.load_sections(formatted)
+    if errors:
+        raise RuntimeError(f"Failed to load sections {sorted(errors)}: {errors}")
+
+    logger.info(f"Fused pipeline finished in {(time.perf_counter() - start) * 1000:.2f} ms")
+    return {
+        'insert_results': insert_results,
+        'anomalies': anomalies
+    }
+
+def run_pipeline_stream(body):
+    """Like ``run_pipeline``, but for a raw JSON body parsed incrementally.
+
+    Each chunk of at most STREAM_CHUNK_ROWS samples is validated, extracted
+    and written before the next one is parsed, so memory use does not grow
+    with the number of samples. All chunks share one transaction, which is
+    committed only after the last chunk has passed validation; a bad row
+    anywhere in the message rolls back every chunk written before it.
+    """
+    start = time.perf_counter()
+    insert_results = {}
+    anomalies = []
+    rows_written = 0
+
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        for chunk in iter_section_chunks(body):
+            section_data, chunk_anomalies = receiver.process_chunk(chunk)
+            anomalies.extend(chunk_anomalies)
+            if chunk.section not in SECTION_STAGES:
+                continue
+            extractor, extract_name, loader, format_name = SECTION_STAGES[chunk.section]
+            with timer('extract'):
+                extracted = getattr(extractor, extract_name)(section_data)
+            with timer('transform'):
+                formatted = getattr(loader, format_name)(extracted)
+            with timer('db_execute'):
+                written = multisection.write_section(cur, chunk.section, formatted)
+            rows_written += int(written)
+            # Same shape as load_sections: rows written per section
+            insert_results[chunk.section] = insert_results.get(chunk.section, 0) + written
+
+        with timer('db_commit'):
+            conn.commit()
+    count('rows_written', rows_written)
+
+    logger.info(f"Fused streaming pipeline finished in {(time.perf_counter() - start) * 1000:.2f} ms")
+    return {
+        'insert_results': insert_results,
+        'anomalies': anomalies
+    }
+
+# For local testing
+if __name__ == "__main__":
+    with open(f"{STAGE_ROOT}/SAMPLE-PAYLOAD/payload.json") as f:
+        sample_event = json.load(f)
+
+    result = lambda_handler(sample_event, None)
+    print(f"Lambda function result: {json.dumps(result, indent=2)}")
@@ -1,32 +1,116 @@
 import json
-import logging
+import time
 from datetime import datetime
+from anomalyrules import find_anomalies
+from codec import encode_body, loads, unwrap
+from metrics import count, instrumented, timed, timer
+from pipelinelog import LazyJson, get_logger, log_payload
+from schemavalidators import SchemaValidationError, get_validator
+from streamingest import ROW_KEYS, chunk_section_data, iter_section_chunks, use_streaming
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger('receiver')
 
+@instrumented('receiver')
 def lambda_handler(event, context):
     logger.info("Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     # Check if the event is from SQS or direct JSON input
     if 'Records' in event and len(event['Records']) > 0:
-        # SQS event
+        # SQS event: process every record in the batch
+        return process_batch(event['Records'])
+
+    # Direct JSON input, possibly in an interstage envelope
+    message = unwrap(event)
+    log_payload(logger, "Processed message", message)
+
+    # Prepare final output
+    output = {
+        'processed_data': process_message(message),
+        'timestamp': datetime.utcnow().isoformat(),
+        'status': 'success'
+    }
+    
+    log_payload(logger, "Processed output", output)
+
+    return {
+        'statusCode': 200,
+        'body': encode_body(output, 'receiver/v1')
+    }
+
+def process_batch(records):
+    batch_start = time.perf_counter()
+    processed_batch = []
+    batch_item_failures = []
+    count('messages', len(records))
+
+    for record in records:
+        message_id = record.get('messageId')
         try:
-            message = json.loads(event['Records'][0]['body'])
+            body = record['body']
+            count('payload_bytes', len(body.encode('utf-8')))
+            streaming = use_streaming(body)
         except Exception as e:
-            logger.error(f"Error parsing SQS message: {str(e)}")
-            return {
-                'statusCode': 400,
-                'body': json.dumps('Error parsing SQS message')
-            }
-    else:
-        # Direct JSON input
-        message = event
+            logger.error(f"Error reading SQS message {message_id}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': message_id})
+            continue
 
-    logger.info(f"Processed message: {json.dumps(message, indent=2)}")
+        if streaming:
+            # Oversized bodies are parsed and validated incrementally, but the
+            # output still carries every sample (see process_message_stream)
+            try:
+                processed_batch.append({
+                    'messageId': message_id,
+                    'processed_data': process_message_stream(body)
+                })
+            except Exception as e:
+                logger.error(f"Error processing SQS message {message_id}: {str(e)}")
+                batch_item_failures.append({'itemIdentifier': message_id})
+            continue
 
+        try:
+            with timer('parse'):
+                message = loads(body)
+            message = unwrap(message)
+        except Exception as e:
+            logger.error(f"Error parsing SQS message {message_id}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': message_id})
+            continue
+
+        try:
+            processed_batch.append({
+                'messageId': message_id,
+                'processed_data': process_message(message)
+            })
+        except Exception as e:
+            logger.error(f"Error processing SQS message {message_id}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': message_id})
+
+    elapsed = time.perf_counter() - batch_start
+    logger.info(
+        f"Processed SQS batch: size={len(records)} succeeded={len(processed_batch)} "
+        f"failed={len(batch_item_failures)} duration_ms={elapsed * 1000:.2f} "
+        f"records_per_sec={len(records) / elapsed if elapsed > 0 else 0:.1f}"
+    )
+
+    # Prepare final output
+    output = {
+        'processed_batch': processed_batch,
+        'timestamp': datetime.utcnow().isoformat(),
+        'status': 'partial' if batch_item_failures else 'success'
+    }
+
+    log_payload(logger, "Processed output", output)
+
+    # batchItemFailures tells SQS to redeliver only the failed messages
+    return {
+        'statusCode': 200,
+        'body': encode_body(output, 'receiver/v1'),
+        'batchItemFailures': batch_item_failures
+    }
+
+def process_message(message):
     # Process and validate each section
     processed_data = {}
     
@@ -40,133 +124,77 @@ def lambda_handler(event, context):
     # Check for anomalies
     anomalies = check_anomalies(processed_data)
     if anomalies:
-        logger.warning(f"Anomalies detected: {anomalies}")
+        logger.warning("Anomalies detected: %s", LazyJson(anomalies))
         processed_data['anomalies'] = anomalies
-    
-    # Prepare final output
-    output = {
-        'processed_data': processed_data,
-        'timestamp': datetime.utcnow().isoformat(),
-        'status': 'success'
-    }
-    
-    logger.info(f"Processed output: {json.dumps(output, indent=2)}")
-    
-    return {
-        'statusCode': 200,
-        'body': json.dumps(output)
-    }
 
-def process_section(section_name, section_data):
-    logger.info(f"Processing {section_name} section")
-    
-    # Validate common fields
-    required_fields = ['token', 'status', 'json-ver']
-    for field in required_fields:
-        if field not in section_data:
-            logger.error(f"Missing required field '{field}' in {section_name} section")
-            raise ValueError(f"Missing required field '{field}' in {section_name} section")
-    
-    # Process specific sections
-    if section_name == 'telemetry':
-        return process_telemetry(section_data)
-    elif section_name == 'error':
-        return process_error(section_data)
-    elif section_name == 'pump':
-        return process_pump(section_data)
-    elif section_name == 'diagnostic':
-        return process_diagnostic(section_data)
-    else:
-        logger.warning(f"Unknown section: {section_name}")
-        return section_data
+    return processed_data
 
-def process_telemetry(data):
-    logger.info("Processing telemetry data")
-    if 'teleParam' not in data or not isinstance(data['teleParam'], list):
-        logger.error("Invalid telemetry data structure")
-        raise ValueError("Invalid telemetry data structure")
-    
-    for param in data['teleParam']:
-        required_fields = ['ts', 'flowRate', 'discharge', 'workHour', 'cummRevDisch', 'Data', 'CycleSlips', 'NoData', 'USS']
-        for field in required_fields:
-            if field not in param:
-                logger.error(f"Missing required field '{field}' in telemetry data")
-                raise ValueError(f"Missing required field '{field}' in telemetry data")
-    
-    return data
+def process_message_stream(body):
+    # Each chunk holds at most STREAM_CHUNK_ROWS samples of one section. The
+    # chunks are validated as they are parsed, but their rows are collected
+    # into one output for the extractors, so memory still grows with the
+    # message; only the fused pipeline keeps it bounded.
+    processed_data = {}
+    anomalies = []
 
-def process_error(data):
-    logger.info("Processing error data")
-    if 'mspErrParam' not in data or not isinstance(data['mspErrParam'], list):
-        logger.error("Invalid error data structure")
-        raise ValueError("Invalid error data structure")
-    
-    for param in data['mspErrParam']:
-        required_fields = ['ts', 'err-code']
-        for field in required_fields:
-            if field not in param:
-                logger.error(f"Missing required field '{field}' in error data")
-                raise ValueError(f"Missing required field '{field}' in error data")
-    
-    return data
+    for chunk in iter_section_chunks(body):
+        section_data, chunk_anomalies = process_chunk(chunk)
+        anomalies.extend(chunk_anomalies)
+        if chunk.rows is None:
+            processed_data[chunk.section] = section_data
+            continue
+        row_key = ROW_KEYS[chunk.section]
+        processed_section = processed_data.setdefault(chunk.section, {row_key: []})
+        processed_section[row_key].extend(chunk.rows)
+        if chunk.last:
+            processed_section.update(chunk.header)
 
-def process_pump(data):
-    logger.info("Processing pump data")
-    if 'pumpParam' not in data or not isinstance(data['pumpParam'], list):
-        logger.error("Invalid pump data structure")
-        raise ValueError("Invalid pump data structure")
-    
-    for param in data['pumpParam']:
-        required_fields = ['PumpStartTs', 'Startdischarge', 'StartData', 'StartNoData', 'StartCycleSlips',
-                           'PumpStoptTs', 'Stopdischarge', 'StopData', 'StopNoData', 'StopCycleSlips']
-        for field in required_fields:
-            if field not in param:
-                logger.error(f"Missing required field '{field}' in pump data")
-                raise ValueError(f"Missing required field '{field}' in pump data")
-    
-    return data
+    for section in ['telemetry', 'error', 'pump', 'diagnostic']:
+        if section not in processed_data:
+            logger.warning(f"Section '{section}' not found in the message")
 
-def process_diagnostic(data):
-    logger.info("Processing diagnostic data")
-    required_sections = ['diagnosParam', 'commParam', 'storedDiagParams']
-    for section in required_sections:
-        if section not in data:
-            logger.error(f"Missing required section '{section}' in diagnostic data")
-            raise ValueError(f"Missing required section '{section}' in diagnostic data")
-    
-    return data
+    if anomalies:
+        logger.warning("Anomalies detected: %s", LazyJson(anomalies))
+        processed_data['anomalies'] = anomalies
+
+    return processed_data
+
+def process_chunk(chunk):
+    # Validate one streamed chunk and check it for anomalies
+    section_data = process_section(chunk.section, chunk_section_data(chunk), chunk.offset)
+    anomalies = check_anomalies({chunk.section: section_data})
+    for anomaly in anomalies:
+        anomaly['row'] += chunk.offset
+    return section_data, anomalies
+
+def process_section(section_name, section_data, row_offset=0):
+    logger.info(f"Processing {section_name} section")
+    if not isinstance(section_data, dict):
+        # Still a ValueError for callers that catch the baseline exception
+        error = SchemaValidationError(section_name, ["section must be an object"])
+        logger.error(str(error))
+        raise error
+
+    # Validators are compiled once per (section, json-ver) and cached
+    validator = get_validator(section_name, section_data.get('json-ver', '*'))
+    if validator is None:
+        logger.warning(f"Unknown section: {section_name}")
+        return section_data
+
+    row_key = ROW_KEYS.get(section_name)
+    count('rows', len(section_data.get(row_key) or ()) if row_key else 1)
+    try:
+        with timer('validate'):
+            return validator.validate(section_data, row_offset)
+    except SchemaValidationError as e:
+        logger.error(str(e))
+        raise
 
+@timed('anomalies')
 def check_anomalies(data):
     logger.info("Checking for anomalies")
-    anomalies = []
-    
-    # Check telemetry anomalies
-    if 'telemetry' in data and 'teleParam' in data['telemetry']:
-        for param in data['telemetry']['teleParam']:
-            if param['flowRate'] < 0 or param['flowRate'] > 100:
-                anomalies.append(f"Unusual flow rate: {param['flowRate']}")
-            if param['discharge'] < 0:
-                anomalies.append(f"Negative discharge: {param['discharge']}")
-    
-    # Check error anomalies
-    if 'error' in data and 'mspErrParam' in data['error']:
-        for param in data['error']['mspErrParam']:
-            if param['err-code'] > 200:
-                anomalies.append(f"High error code: {param['err-code']}")
-    
-    # Check pump anomalies
-    if 'pump' in data and 'pumpParam' in data['pump']:
-        for param in data['pump']['pumpParam']:
-            if param['PumpStoptTs'] <= param['PumpStartTs']:
-                anomalies.append("Pump stop time is before or equal to start time")
-    
-    # Check diagnostic anomalies
-    if 'diagnostic' in data and 'diagnosParam' in data['diagnostic']:
-        diag_param = data['diagnostic']['diagnosParam']
-        if diag_param['RSSI'] > -30 or diag_param['RSSI'] < -120:
-            anomalies.append(f"Unusual RSSI value: {diag_param['RSSI']}")
-    
-    return anomalies
+    # Rules are declared in COMMON/anomalyrules.py and compiled at cold start
+    return find_anomalies(data)
 
 # For local testing
 if __name__ == "__main__":
@@ -0,0 +1,333 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; it only makes NDJSON output faster
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; columnar output falls back to .npz files
+    pa = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ERROR_CODES = np.array([127, 175, 176])
+STORED_DIAG_PARAMS = 3
+
+
+class Fleet:
+    """Per-device state carried from one chunk of messages to the next.
+
+    Counters start at values drawn from the ranges the sample script uses and
+    only ever grow, so every device's readings stay monotonic over the whole
+    dataset, however it is chunked.
+    """
+
+    def __init__(self, rng, size, token_prefix, period_ms):
+        self.size = size
+        self.tokens = np.array([f"{token_prefix}{index:06d}" for index in range(size)])
+        # Devices report on their own phase within the period
+        self.phase_ms = rng.integers(0, period_ms, size)
+        self.discharge = rng.integers(36000, 37000, size)
+        self.work_hour = rng.integers(21000, 23000, size)
+        self.data = rng.integers(210000, 230000, size)
+        self.cycle_slips = rng.integers(50000, 53000, size)
+        self.no_data = rng.integers(600, 700, size)
+        self.uss = rng.integers(52000000, 53000000, size)
+        self.pump_discharge = rng.integers(19000000, 20000000, size)
+        self.pump_data = rng.integers(5000, 15000, size)
+        self.pump_no_data = rng.integers(700, 2000, size)
+        self.pump_cycle_slips = rng.integers(30, 600, size)
+
+
+def advance(counter, devices, increments):
+    """Running values of per-device ``counter`` for a chunk of messages.
+
+    ``increments`` has one row per message (in ``devices`` order) and one
+    column per sample. Each message continues from where the previous message
+    of the same device left off; ``counter`` is updated in place.
+    """
+    within = np.cumsum(increments, axis=1)
+    totals = within[:, -1]
+
+    # Exclusive running total of earlier messages of the same device
+    order = np.argsort(devices, kind='stable')
+    sorted_devices = devices[order]
+    sorted_totals = totals[order]
+    running = np.cumsum(sorted_totals) - sorted_totals
+    starts = np.flatnonzero(np.r_[True, sorted_devices[1:] != sorted_devices[:-1]])
+    running -= np.repeat(running[starts], np.diff(np.r_[starts, len(devices)]))
+    earlier = np.empty_like(running)
+    earlier[order] = running
+
+    values = counter[devices][:, None] + earlier[:, None] + within
+    np.add.at(counter, devices, totals)
+    return values
+
+
+def cycle_readings(counter, devices, gap, during):
+    """Start and stop readings of pump cycles.
+
+    The counter grows by ``gap`` between cycles and by ``during`` within
+    each cycle, so every stop reading is at least its start reading and at
+    most the next cycle's start reading.
+    """
+    stop = advance(counter, devices, gap + during)
+    return stop - during, stop
+
+
+def generate_chunk(rng, fleet, first, count, args):
+    """Columns for messages ``first`` .. ``first + count - 1``, section by section."""
+    period_ms = args.samples * args.interval_ms
+    message = np.arange(first, first + count)
+    devices = message % fleet.size
+    start_ms = args.start_ms + (message // fleet.size) * period_ms + fleet.phase_ms[devices]
+    shape = (count, args.samples)
+
+    flow_rate = np.round(rng.uniform(0, 10, shape), 14)
+    telemetry = {
+        'ts': start_ms[:, None] + np.arange(args.samples) * args.interval_ms,
+        'flowRate': flow_rate,
+        # Discharge accumulates with the flow
+        'discharge': advance(fleet.discharge, devices, np.rint(flow_rate * args.interval_ms / 1000).astype(np.int64)),
+        'workHour': advance(fleet.work_hour, devices, (rng.random(shape) < args.interval_ms / 3600000).astype(np.int64)),
+        'cummRevDisch': rng.integers(-10, 11, shape),
+        'Data': advance(fleet.data, devices, rng.integers(0, 4, shape)),
+        'CycleSlips': advance(fleet.cycle_slips, devices, rng.integers(0, 2, shape)),
+        'NoData': advance(fleet.no_data, devices, (rng.random(shape) < 0.01).astype(np.int64)),
+        'USS': advance(fleet.uss, devices, rng.integers(0, 50, shape))
+    }
+
+    error_shape = (count, args.errors)
+    errors = {
+        'ts': start_ms[:, None] + rng.integers(0, period_ms, error_shape),
+        'err-code': rng.choice(ERROR_CODES, error_shape)
+    }
+
+    # One pump cycle per equal slot of the period, so a device's cycles never overlap
+    pump_shape = (count, args.pumps)
+    slot_ms = period_ms // args.pumps
+    duration_ms = rng.integers(min(5000, slot_ms), min(1800000, slot_ms) + 1, pump_shape)
+    pump_start = start_ms[:, None] + np.arange(args.pumps) * slot_ms + (rng.random(pump_shape) * (slot_ms - duration_ms)).astype(np.int64)
+    pumped = np.rint(duration_ms / 1000 * rng.uniform(0.5, 2.0, pump_shape)).astype(np.int64)
+    start_discharge, stop_discharge = cycle_readings(fleet.pump_discharge, devices, 0, pumped)
+    start_data, stop_data = cycle_readings(fleet.pump_data, devices, rng.integers(1, 50, pump_shape), duration_ms // 1000)
+    start_no_data, stop_no_data = cycle_readings(fleet.pump_no_data, devices, rng.integers(0, 5, pump_shape), rng.integers(0, 10, pump_shape))
+    start_cycle_slips, stop_cycle_slips = cycle_readings(fleet.pump_cycle_slips, devices, rng.integers(0, 5, pump_shape), rng.integers(0, 20, pump_shape))
+    pump = {
+        'PumpStartTs': pump_start,
+        'Startdischarge': start_discharge,
+        'StartData': start_data,
+        'StartNoData': start_no_data,
+        'StartCycleSlips': start_cycle_slips,
+        'PumpStoptTs': pump_start + duration_ms,
+        'Stopdischarge': stop_discharge,
+        'StopData': stop_data,
+        'StopNoData': stop_no_data,
+        'StopCycleSlips': stop_cycle_slips
+    }
+
+    diagnostic = {
+        'ts': start_ms + period_ms - 1,
+        'RSSI': rng.integers(-100, -49, count),
+        'ttc': rng.integers(3000, 5001, count),
+        'simId': rng.integers(1, 3, count),
+        'vBatNoLoad': rng.integers(325, 336, count),
+        'vBatonLoad': rng.integers(325, 346, count),
+        'vSuperCap': rng.integers(300, 326, count),
+        'pppTime': rng.integers(30, 51, count),
+        'ntpTime': rng.integers(30, 51, count),
+        'serverCmdsTime': rng.integers(1, 6, count),
+        'stored': {
+            'pppTime': rng.integers(0, 51, (count, STORED_DIAG_PARAMS)),
+            'simId': rng.integers(1, 3, (count, STORED_DIAG_PARAMS)),
+            'RSSI': rng.integers(-110, -49, (count, STORED_DIAG_PARAMS)),
+            'vBatNoLoad': rng.integers(325, 341, (count, STORED_DIAG_PARAMS)),
+            'vBatonLoad': rng.integers(325, 351, (count, STORED_DIAG_PARAMS)),
+            'vSuperCap': rng.integers(300, 351, (count, STORED_DIAG_PARAMS))
+        }
+    }
+
+    return {
+        'token': fleet.tokens[devices],
+        'telemetry': telemetry,
+        'error': errors,
+        'pump': pump,
+        'diagnostic': diagnostic
+    }
+
+
+def _rows(columns):
+    # {field: (messages, n) array} -> per message, a list of n {field: value} dicts
+    names = list(columns)
+    values = [columns[name].tolist() for name in names]
+    return [
+        [dict(zip(names, sample)) for sample in zip(*message)]
+        for message in zip(*values)
+    ]
+
+
+def iter_payloads(chunk, status='ok'):
+    """Combined payloads in the sample script's format, one dict per message."""
+    tokens = chunk['token'].tolist()
+    telemetry = _rows(chunk['telemetry'])
+    errors = _rows(chunk['error'])
+    pumps = _rows(chunk['pump'])
+
+    diagnostic = chunk['diagnostic']
+    diag = {name: column.tolist() for name, column in diagnostic.items() if name != 'stored'}
+    stored = _rows(diagnostic['stored'])
+
+    for index, token in enumerate(tokens):
+        yield {
+            'telemetry': {'token': token, 'status': status, 'json-ver': 'v1.2', 'teleParam': telemetry[index]},
+            'error': {'token': token, 'status': status, 'json-ver': 'v1.4', 'mspErrParam': errors[index]},
+            'pump': {'token': token, 'status': status, 'json-ver': 'v1.4', 'pumpParam': pumps[index]},
+            'diagnostic': {
+                'token': token,
+                'status': status,
+                'ts': diag['ts'][index],
+                'json-ver': 'v1.4',
+                'diagnosParam': {name: diag[name][index] for name in ('RSSI', 'ttc', 'simId', 'vBatNoLoad', 'vBatonLoad', 'vSuperCap')},
+                'commParam': {name: diag[name][index] for name in ('pppTime', 'ntpTime', 'serverCmdsTime')},
+                'storedDiagParams': {
+                    f"param{position}": dict(param, reason='err-server-con', serverTime=120)
+                    for position, param in enumerate(stored[index], 1)
+                }
+            }
+        }
+
+
+def flat_tables(chunk):
+    """One flat table (name -> 1-D column) per section, for columnar output."""
+    tables = {}
+    for section in ('telemetry', 'error', 'pump'):
+        columns = chunk[section]
+        per_message = next(iter(columns.values())).shape[1]
+        table = {'token': np.repeat(chunk['token'], per_message)}
+        table.update((name, column.ravel()) for name, column in columns.items())
+        tables[section] = table
+
+    diagnostic = chunk['diagnostic']
+    table = {'token': chunk['token']}
+    table.update((name, column) for name, column in diagnostic.items() if name != 'stored')
+    for name, column in diagnostic['stored'].items():
+        for position in range(column.shape[1]):
+            table[f"param{position + 1}_{name}"] = column[:, position]
+    tables['diagnostic'] = table
+    return tables
+
+
+class NdjsonWriter:
+    def __init__(self, path, compress_level):
+        if path.endswith('.gz'):
+            self.file = gzip.open(path, 'wb', compresslevel=compress_level)
+        else:
+            self.file = open(path, 'wb')
+
+    def write(self, chunk):
+        if orjson is not None:
+            lines = [orjson.dumps(payload) for payload in iter_payloads(chunk)]
+        else:
+            lines = [json.dumps(payload, separators=(',', ':')).encode() for payload in iter_payloads(chunk)]
+        self.file.write(b'\n'.join(lines))
+        self.file.write(b'\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """One Parquet file per section in ``path``; each chunk becomes a row group."""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.writers = {}
+
+    def write(self, chunk):
+        for section, table in flat_tables(chunk).items():
+            table = pa.table(table)
+            if section not in self.writers:
+                self.writers[section] = pq.ParquetWriter(os.path.join(self.path, f"{section}.parquet"), table.schema, compression='zstd')
+            self.writers[section].write_table(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+class NpzWriter:
+    """One compressed .npz file per section and chunk in ``path``."""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunks = 0
+
+    def write(self, chunk):
+        for section, table in flat_tables(chunk).items():
+            np.savez_compressed(os.path.join(self.path, f"{section}-{self.chunks:05d}.npz"), **table)
+        self.chunks += 1
+
+    def close(self):
+        pass
+
+
+def open_writer(output_format, path, compress_level):
+    if output_format == 'ndjson':
+        return NdjsonWriter(path, compress_level)
+    if output_format == 'parquet':
+        if pa is None:
+            raise SystemExit("Parquet output needs pyarrow; use --format npz instead")
+        return ParquetWriter(path)
+    return NpzWriter(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a reproducible corpus of combined device payloads.')
+    parser.add_argument('--messages', type=int, default=1000000, help='total combined payloads to generate')
+    parser.add_argument('--fleet', type=int, default=10000, help='number of devices; messages go round-robin')
+    parser.add_argument('--token-prefix', default='FM', help='token prefix; tokens are <prefix><6-digit index>')
+    parser.add_argument('--samples', type=int, default=1, help='teleParam samples per message')
+    parser.add_argument('--errors', type=int, default=1, help='mspErrParam entries per message')
+    parser.add_argument('--pumps', type=int, default=1, help='pump cycles per message')
+    parser.add_argument('--interval-ms', type=int, default=60000, help='time between telemetry samples of a device')
+    parser.add_argument('--start-ms', type=int, default=1732406400000, help='epoch ms of the first report period')
+    parser.add_argument('--seed', type=int, default=1037, help='random seed; the same seed and --chunk give the same corpus')
+    parser.add_argument('--chunk', type=int, default=50000, help='messages generated and written at a time')
+    parser.add_argument('--format', choices=['ndjson', 'parquet', 'npz'], default='ndjson', help='output format')
+    parser.add_argument('--output', default='corpus.ndjson.gz',
+                        help='NDJSON file (.gz is compressed), or a directory for parquet/npz')
+    parser.add_argument('--compress-level', type=int, default=1,
+                        help='gzip level for .gz NDJSON output; higher is smaller but slower (default: %(default)s)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    fleet = Fleet(rng, args.fleet, args.token_prefix, args.samples * args.interval_ms)
+    writer = open_writer(args.format, args.output, args.compress_level)
+
+    start = time.perf_counter()
+    try:
+        for first in range(0, args.messages, args.chunk):
+            count = min(args.chunk, args.messages - first)
+            writer.write(generate_chunk(rng, fleet, first, count, args))
+            logging.info(f"Wrote {first + count}/{args.messages} messages ({(first + count) / (time.perf_counter() - start):.0f} msg/s)")
+    finally:
+        writer.close()
+
+    logging.info(f"Generated {args.messages} messages for {args.fleet} devices in {time.perf_counter() - start:.1f}s to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
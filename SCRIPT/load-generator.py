@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import statistics
+import time
+
+# The receiver sink would otherwise print a metrics record per message
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+from codec import parse_event_body
+from stageloader import load_stage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Payload generators and AWS IoT settings of the single-message script
+generator = load_stage('SCRIPT/sample-data-generation-script.py')
+
+
+def device_tokens(count, prefix):
+    return [f"{prefix}{index:06d}" for index in range(count)]
+
+
+def expected_messages(profile, rate, elapsed, ramp_seconds, steps):
+    """Messages the profile calls for in the first ``elapsed`` seconds.
+
+    constant - ``rate`` per second from the start
+    ramp     - rising linearly from 0 to ``rate`` over ``ramp_seconds``, then ``rate``
+    step     - ``steps`` equal increments spread over ``ramp_seconds``, then ``rate``
+    """
+    if profile == 'constant':
+        return rate * elapsed
+    ramp = min(elapsed, ramp_seconds)
+    if profile == 'ramp':
+        messages = rate * ramp * ramp / (2 * ramp_seconds)
+    elif profile == 'step':
+        step_seconds = ramp_seconds / steps
+        done = min(math.floor(ramp / step_seconds), steps)
+        # Step i runs at rate * (i + 1) / steps
+        messages = rate * step_seconds * done * (done + 1) / (2 * steps)
+        if done < steps:
+            messages += rate * (done + 1) / steps * (ramp - done * step_seconds)
+    else:
+        raise ValueError(f"Unknown ramp profile {profile!r}")
+    return messages + rate * max(elapsed - ramp_seconds, 0)
+
+
+class MqttSink:
+    """Publishes every message over one shared AWS IoT MQTT connection."""
+
+    def __init__(self, args):
+        from awscrt import io, mqtt
+        from awsiot import mqtt_connection_builder
+
+        self._qos = mqtt.QoS.AT_LEAST_ONCE
+        self.topic = args.topic or generator.AWS_IOT_TOPIC
+        event_loop_group = io.EventLoopGroup(1)
+        host_resolver = io.DefaultHostResolver(event_loop_group)
+        client_bootstrap = io.ClientBootstrap(event_loop_group, host_resolver)
+        self.connection = mqtt_connection_builder.mtls_from_path(
+            endpoint=args.endpoint or generator.AWS_IOT_ENDPOINT,
+            port=generator.AWS_IOT_PORT,
+            cert_filepath=generator.AWS_IOT_CERT_PATH,
+            pri_key_filepath=generator.AWS_IOT_KEY_PATH,
+            ca_filepath=generator.AWS_IOT_ROOT_CA_PATH,
+            client_bootstrap=client_bootstrap,
+            client_id=args.client_id or generator.AWS_IOT_CLIENT_ID,
+            clean_session=False,
+            keep_alive_secs=30,
+            on_connection_interrupted=generator.on_connection_interrupted,
+            on_connection_resumed=generator.on_connection_resumed
+        )
+
+    async def open(self):
+        await asyncio.wrap_future(self.connection.connect())
+        logging.info("Connected to AWS IoT")
+
+    async def send(self, payload):
+        # Completes when the broker acknowledges the QoS 1 publish
+        publish_future, _ = self.connection.publish(topic=self.topic, payload=payload, qos=self._qos)
+        await asyncio.wrap_future(publish_future)
+
+    async def close(self):
+        await asyncio.wrap_future(self.connection.disconnect())
+        logging.info("Disconnected from AWS IoT")
+
+
+class FileSink:
+    """Appends one JSON message per line; ``.gz`` paths are gzip-compressed."""
+
+    def __init__(self, args):
+        self.path = args.output_file
+
+    async def open(self):
+        self.file = gzip.open(self.path, 'at') if self.path.endswith('.gz') else open(self.path, 'a')
+
+    async def send(self, payload):
+        self.file.write(payload)
+        self.file.write('\n')
+
+    async def close(self):
+        self.file.close()
+
+
+class ReceiverSink:
+    """Calls the receiver Lambda handler in-process, off the event loop."""
+
+    def __init__(self, args):
+        self.receiver = load_stage('RECEIVE/payloadreceiver.py')
+
+    async def open(self):
+        pass
+
+    async def send(self, payload):
+        event = {'Records': [{'messageId': str(time.monotonic_ns()), 'body': payload}]}
+        result = await asyncio.get_running_loop().run_in_executor(None, self.receiver.lambda_handler, event, None)
+        if result.get('batchItemFailures'):
+            # The body may be an interstage envelope (INTERSTAGE_ENCODING)
+            raise RuntimeError(parse_event_body(result))
+
+    async def close(self):
+        pass
+
+
+SINKS = {'mqtt': MqttSink, 'file': FileSink, 'receiver': ReceiverSink}
+
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.latencies = []
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        summary = {
+            'sent': self.sent,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'duration_s': duration,
+            'achieved_rate': self.succeeded / duration if duration > 0 else 0.0
+        }
+        if latencies:
+            for name, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('p999', 0.999)):
+                summary[f'latency_{name}_ms'] = latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+            summary['latency_mean_ms'] = statistics.fmean(latencies) * 1000
+            summary['latency_max_ms'] = latencies[-1] * 1000
+        return summary
+
+
+async def publish(sink, payload, stats, in_flight):
+    start = time.perf_counter()
+    try:
+        await sink.send(payload)
+        stats.latencies.append(time.perf_counter() - start)
+        stats.succeeded += 1
+    except Exception as e:
+        stats.failed += 1
+        logging.error(f"Publish failed: {e}")
+    finally:
+        in_flight.release()
+
+
+async def report(stats, start, interval):
+    previous = 0
+    while True:
+        await asyncio.sleep(interval)
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"{elapsed:7.1f}s sent={stats.sent} ok={stats.succeeded} failed={stats.failed} "
+            f"rate={(stats.succeeded - previous) / interval:.1f} msg/s"
+        )
+        previous = stats.succeeded
+
+
+async def run(args):
+    sink = SINKS[args.sink](args)
+    await sink.open()
+
+    tokens = device_tokens(args.devices, args.token_prefix)
+    stats = Stats()
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    tasks = set()
+    start = time.perf_counter()
+    reporter = asyncio.create_task(report(stats, start, args.report_interval))
+
+    device = 0
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= args.duration:
+                break
+            if stats.sent >= expected_messages(args.profile, args.rate, elapsed, args.ramp_seconds, args.steps):
+                await asyncio.sleep(0.001)
+                continue
+
+            # Wait here when the sink falls behind, instead of queueing without bound
+            await in_flight.acquire()
+            payload = json.dumps(generator.generate_combined_data(int(time.time() * 1000), args.samples, tokens[device]))
+            device = (device + 1) % len(tokens)
+            stats.sent += 1
+
+            task = asyncio.create_task(publish(sink, payload, stats, in_flight))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        reporter.cancel()
+        await sink.close()
+
+    return stats.summary(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate many devices publishing combined payloads.')
+    parser.add_argument('--sink', choices=sorted(SINKS), default='file', help='where messages go (default: %(default)s)')
+    parser.add_argument('--devices', type=int, default=1000, help='number of simulated devices with unique tokens')
+    parser.add_argument('--token-prefix', default='FM', help='token prefix; tokens are <prefix><6-digit index>')
+    parser.add_argument('--rate', type=float, default=100.0, help='target messages per second across all devices')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds to run')
+    parser.add_argument('--samples', type=int, default=1, help='samples per section in each message')
+    parser.add_argument('--profile', choices=['constant', 'ramp', 'step'], default='constant', help='rate profile')
+    parser.add_argument('--ramp-seconds', type=float, default=30.0, help='length of the ramp or step phase')
+    parser.add_argument('--steps', type=int, default=5, help='number of steps for the step profile')
+    parser.add_argument('--max-in-flight', type=int, default=1000, help='unacknowledged messages allowed at once')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='seconds between progress lines')
+    parser.add_argument('--output-file', default='load.ndjson', help='file sink path; .gz is compressed')
+    parser.add_argument('--endpoint', help='AWS IoT endpoint (default: AWS_IOT_ENDPOINT of the sample script)')
+    parser.add_argument('--topic', help='MQTT topic (default: AWS_IOT_TOPIC of the sample script)')
+    parser.add_argument('--client-id', help='MQTT client id (default: AWS_IOT_CLIENT_ID of the sample script)')
+    parser.add_argument('--summary', help='also write the summary as JSON to this file')
+    args = parser.parse_args()
+    if args.devices < 1:
+        parser.error("--devices must be at least 1")
+    if args.rate <= 0:
+        parser.error("--rate must be positive")
+    if args.max_in_flight < 1:
+        parser.error("--max-in-flight must be at least 1")
+    if args.profile in ('ramp', 'step') and args.ramp_seconds <= 0:
+        parser.error(f"--ramp-seconds must be positive for the {args.profile} profile")
+    if args.profile == 'step' and args.steps < 1:
+        parser.error("--steps must be at least 1 for the step profile")
+
+    summary = asyncio.run(run(args))
+    summary.update({'sink': args.sink, 'devices': args.devices, 'target_rate': args.rate,
+                    'profile': args.profile, 'samples': args.samples})
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,6 @@ import json
 import random
 import time
 import logging
-from awscrt import io, mqtt
-from awsiot import mqtt_connection_builder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -106,6 +104,32 @@ def generate_diagnostic_param(timestamp):
         }
     }
 
+# section -> (generator function, key of its sample list)
+SECTION_GENERATORS = {
+    "telemetry": (generate_tele_param, "teleParam"),
+    "error": (generate_error_param, "mspErrParam"),
+    "pump": (generate_pump_param, "pumpParam"),
+    "diagnostic": (generate_diagnostic_param, None)
+}
+
+def generate_combined_data(timestamp, samples=1, token=None, interval_ms=1000):
+    """One combined payload with ``samples`` entries in every sample list.
+
+    Samples are ``interval_ms`` apart, starting at ``timestamp``. ``token``
+    replaces the hard-coded device tokens.
+    """
+    combined_data = {}
+    for section, (generate, rows_key) in SECTION_GENERATORS.items():
+        section_data = generate(timestamp)
+        if rows_key is not None and samples != 1:
+            section_data[rows_key] = [
+                generate(timestamp + index * interval_ms)[rows_key][0] for index in range(samples)
+            ]
+        if token is not None:
+            section_data["token"] = token
+        combined_data[section] = section_data
+    return combined_data
+
 def on_connection_interrupted(connection, error, **kwargs):
     logging.error(f"Connection interrupted. error: {error}")
 
@@ -113,6 +137,10 @@ def on_connection_resumed(connection, return_code, session_present, **kwargs):
     logging.info(f"Connection resumed. return_code: {return_code} session_present: {session_present}")
 
 def main():
+    # Imported here so the generate_* functions can be reused without the AWS IoT SDK
+    from awscrt import io, mqtt
+    from awsiot import mqtt_connection_builder
+
     # Spin up resources
     event_loop_group = io.EventLoopGroup(1)
     host_resolver = io.DefaultHostResolver(event_loop_group)
@@ -140,12 +168,7 @@ def main():
         timestamp = int(time.time() * 1000)
         
         # Generate all data types
-        combined_data = {
-            "telemetry": generate_tele_param(timestamp),
-            "error": generate_error_param(timestamp),
-            "pump": generate_pump_param(timestamp),
-            "diagnostic": generate_diagnostic_param(timestamp)
-        }
+        combined_data = generate_combined_data(timestamp)
 
         # Convert to JSON
         json_data = json.dumps(combined_data, indent=2)
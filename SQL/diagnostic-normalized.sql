@@ -0,0 +1,48 @@
+-- Typed diagnostic storage used with DIAGNOSTIC_LOAD_MODE=normalized.
+
+CREATE TABLE IF NOT EXISTS diagnostic_readings (
+    id               bigserial PRIMARY KEY,
+    token            text NOT NULL,
+    status           text,
+    json_ver         text,
+    timestamp        timestamptz NOT NULL,
+    -- diagnosParam
+    rssi             smallint,
+    ttc              integer,
+    sim_id           smallint,
+    v_bat_no_load    integer,
+    v_bat_on_load    integer,
+    v_super_cap      integer,
+    -- commParam
+    ppp_time         integer,
+    ntp_time         integer,
+    server_cmds_time integer
+);
+
+-- Natural key for idempotent loads. Tables created by an earlier version of
+-- this script had a plain index and may hold duplicates; stored params of
+-- removed readings go with them through ON DELETE CASCADE.
+DELETE FROM diagnostic_readings a USING diagnostic_readings b
+WHERE a.id > b.id AND a.token = b.token AND a.timestamp = b.timestamp;
+DROP INDEX IF EXISTS diagnostic_readings_token_timestamp_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS diagnostic_readings_token_timestamp_key ON diagnostic_readings (token, timestamp);
+CREATE INDEX IF NOT EXISTS diagnostic_readings_rssi_idx ON diagnostic_readings (rssi);
+CREATE INDEX IF NOT EXISTS diagnostic_readings_v_super_cap_idx ON diagnostic_readings (v_super_cap);
+
+-- One row per storedDiagParams entry (param1..paramN)
+CREATE TABLE IF NOT EXISTS diagnostic_stored_params (
+    reading_id    bigint NOT NULL REFERENCES diagnostic_readings (id) ON DELETE CASCADE,
+    param_index   smallint NOT NULL,
+    reason        text,
+    ppp_time      integer,
+    server_time   integer,
+    sim_id        smallint,
+    rssi          smallint,
+    v_bat_no_load integer,
+    v_bat_on_load integer,
+    v_super_cap   integer,
+    PRIMARY KEY (reading_id, param_index)
+);
+
+CREATE INDEX IF NOT EXISTS diagnostic_stored_params_rssi_idx ON diagnostic_stored_params (rssi);
+CREATE INDEX IF NOT EXISTS diagnostic_stored_params_v_super_cap_idx ON diagnostic_stored_params (v_super_cap);
@@ -0,0 +1,34 @@
+-- Error catalog lookup tables and the category column on error_data.
+-- Keep in sync with COMMON/errorcatalog.json.
+
+CREATE TABLE IF NOT EXISTS error_categories (
+    id   smallint PRIMARY KEY,
+    name text NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS error_codes (
+    code        integer PRIMARY KEY,
+    description text NOT NULL,
+    severity    text NOT NULL,
+    category_id smallint NOT NULL REFERENCES error_categories (id)
+);
+
+INSERT INTO error_categories (id, name) VALUES
+    (0, 'unknown'),
+    (1, 'system'),
+    (2, 'communication')
+ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name;
+
+INSERT INTO error_codes (code, description, severity, category_id) VALUES
+    (127, 'General system error', 'critical', 1),
+    (175, 'Communication failure', 'major', 2),
+    -- Sent by devices, but its meaning is not yet confirmed; placeholder only
+    (176, 'Unconfirmed device error 176', 'unknown', 0)
+ON CONFLICT (code) DO UPDATE SET
+    description = EXCLUDED.description,
+    severity = EXCLUDED.severity,
+    category_id = EXCLUDED.category_id;
+
+ALTER TABLE error_data ADD COLUMN IF NOT EXISTS error_category_id smallint REFERENCES error_categories (id);
+-- Descriptions are optional once rows carry a category (ERROR_STORE_DESCRIPTION=false)
+ALTER TABLE error_data ALTER COLUMN error_description DROP NOT NULL;
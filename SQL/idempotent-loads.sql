@@ -0,0 +1,22 @@
+-- Natural keys that make redelivered messages safe to load again.
+-- The loaders insert with ON CONFLICT (...) DO NOTHING against these indexes.
+-- Existing duplicates must be removed before the unique indexes can be built.
+
+DELETE FROM telemetry_data a USING telemetry_data b
+WHERE a.ctid > b.ctid AND a.token = b.token AND a.timestamp = b.timestamp;
+CREATE UNIQUE INDEX IF NOT EXISTS telemetry_data_token_timestamp_key ON telemetry_data (token, timestamp);
+
+DELETE FROM pump_data a USING pump_data b
+WHERE a.ctid > b.ctid AND a.token = b.token AND a.pump_start_time = b.pump_start_time;
+CREATE UNIQUE INDEX IF NOT EXISTS pump_data_token_pump_start_time_key ON pump_data (token, pump_start_time);
+
+DELETE FROM error_data a USING error_data b
+WHERE a.ctid > b.ctid AND a.token = b.token AND a.timestamp = b.timestamp AND a.error_code = b.error_code;
+CREATE UNIQUE INDEX IF NOT EXISTS error_data_token_timestamp_error_code_key ON error_data (token, timestamp, error_code);
+
+DELETE FROM diagnostic_data a USING diagnostic_data b
+WHERE a.ctid > b.ctid AND a.token = b.token AND a.timestamp = b.timestamp;
+CREATE UNIQUE INDEX IF NOT EXISTS diagnostic_data_token_timestamp_key ON diagnostic_data (token, timestamp);
+
+-- diagnostic_readings is deduplicated and indexed by SQL/diagnostic-normalized.sql,
+-- since it only exists with DIAGNOSTIC_LOAD_MODE=normalized
@@ -0,0 +1,29 @@
+-- Per-device aggregates maintained by the loaders when ROLLUP_BUCKETS is set.
+-- One row per (token, bucket_width, bucket); bucket is the start of the UTC
+-- minute, hour or day. Only rows actually inserted into the raw tables are
+-- counted, so redelivered messages do not inflate the totals.
+
+CREATE TABLE IF NOT EXISTS telemetry_rollups (
+    token         text NOT NULL,
+    bucket_width  text NOT NULL,
+    bucket        timestamptz NOT NULL,
+    sample_count  bigint NOT NULL,
+    flow_rate_min double precision,
+    flow_rate_max double precision,
+    flow_rate_sum double precision,
+    -- discharge is cumulative; the delta within a bucket is discharge_max - discharge_min
+    discharge_min bigint,
+    discharge_max bigint,
+    PRIMARY KEY (token, bucket_width, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS pump_rollups (
+    token                text NOT NULL,
+    bucket_width         text NOT NULL,
+    -- bucket of the cycle's pump_start_time
+    bucket               timestamptz NOT NULL,
+    cycle_count          bigint NOT NULL,
+    duration_seconds_sum double precision,
+    discharge_sum        bigint,
+    PRIMARY KEY (token, bucket_width, bucket)
+);
@@ -0,0 +1,36 @@
+-- Converts telemetry_data into a table range-partitioned on timestamp.
+-- Run once, then deploy the loaders with TELEMETRY_PARTITION_INTERVAL=day or month;
+-- they create the daily or monthly partitions themselves.
+--
+-- Existing rows stay where they are: the old table is attached as one partition
+-- ending at the first of the month after its newest row. That boundary is both a
+-- day and a month boundary, so either interval can follow it.
+
+BEGIN;
+
+ALTER TABLE telemetry_data RENAME TO telemetry_data_legacy;
+
+CREATE TABLE telemetry_data (LIKE telemetry_data_legacy INCLUDING DEFAULTS)
+    PARTITION BY RANGE (timestamp);
+
+-- Natural key used by ON CONFLICT; it includes the partition key, as PostgreSQL requires
+CREATE UNIQUE INDEX telemetry_data_token_timestamp_part_key ON telemetry_data (token, timestamp);
+
+DO $$
+DECLARE
+    cutover timestamptz;
+BEGIN
+    SELECT date_trunc('month', coalesce(max(timestamp), now()) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' + interval '1 month'
+    INTO cutover
+    FROM telemetry_data_legacy;
+
+    EXECUTE format(
+        'ALTER TABLE telemetry_data ATTACH PARTITION telemetry_data_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        to_char(cutover AT TIME ZONE 'UTC', 'YYYY-MM-DD "00:00:00+00"')
+    );
+END $$;
+
+COMMIT;
+
+-- Old data is removed by dropping whole partitions instead of DELETE + VACUUM, e.g.
+--   DROP TABLE telemetry_data_20241125;
@@ -1,65 +1,116 @@
 import json
-import logging
 import os
 import psycopg2
 from datetime import datetime
+from bulkload import build_insert, insert_values
+from codec import dumps, parse_event_body
+from dbpool import db_pool
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from recentkeys import RecentKeys
+from timestamps import to_db_timestamp
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger('diagnostic-load')
 
-# Database connection parameters
-DB_HOST = '54.147.228.91'
-DB_NAME = 'postgres'
-DB_USER = 'postgres'
-DB_PASSWORD = 'postgresql'
+# 'json' stores the parameter objects as JSON text in diagnostic_data;
+# 'normalized' stores typed columns in diagnostic_readings plus one
+# diagnostic_stored_params row per storedDiagParams entry
+DIAGNOSTIC_LOAD_MODE = os.environ.get('DIAGNOSTIC_LOAD_MODE', 'json')
 
+# (source key, column) for the flattened diagnosParam and commParam fields
+DIAGNOS_PARAM_COLUMNS = (
+    ('RSSI', 'rssi'),
+    ('ttc', 'ttc'),
+    ('simId', 'sim_id'),
+    ('vBatNoLoad', 'v_bat_no_load'),
+    ('vBatonLoad', 'v_bat_on_load'),
+    ('vSuperCap', 'v_super_cap')
+)
+COMM_PARAM_COLUMNS = (
+    ('pppTime', 'ppp_time'),
+    ('ntpTime', 'ntp_time'),
+    ('serverCmdsTime', 'server_cmds_time')
+)
+STORED_PARAM_COLUMNS = (
+    ('reason', 'reason'),
+    ('pppTime', 'ppp_time'),
+    ('serverTime', 'server_time'),
+    ('simId', 'sim_id'),
+    ('RSSI', 'rssi'),
+    ('vBatNoLoad', 'v_bat_no_load'),
+    ('vBatonLoad', 'v_bat_on_load'),
+    ('vSuperCap', 'v_super_cap')
+)
+
+READING_COLUMNS = ('token', 'status', 'json_ver', 'timestamp') + tuple(
+    column for _, column in DIAGNOS_PARAM_COLUMNS + COMM_PARAM_COLUMNS
+)
+# Natural key of a diagnostic report in both modes; redelivered reports are skipped
+DIAGNOSTIC_KEY = ('token', 'timestamp')
+
+READING_INSERT_SQL = (
+    f"INSERT INTO diagnostic_readings ({', '.join(READING_COLUMNS)}) "
+    f"VALUES ({', '.join(f'%({column})s' for column in READING_COLUMNS)}) "
+    f"ON CONFLICT ({', '.join(DIAGNOSTIC_KEY)}) DO NOTHING RETURNING id"
+)
+STORED_PARAMS_INSERT_SQL, _ = build_insert(
+    'diagnostic_stored_params',
+    ('reading_id', 'param_index') + tuple(column for _, column in STORED_PARAM_COLUMNS),
+    conflict=('reading_id', 'param_index')
+)
+
+# Keys committed by this container, checked before any database round trip
+recent_keys = RecentKeys(lambda record: (record['token'], record['timestamp']))
+
+@instrumented('diagnostic-load')
 def lambda_handler(event, context):
     logger.info("Diagnostic Data DB Inserter Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract diagnostic data
         if 'diagnostic' in body:
             diagnostic_data = body['diagnostic']
-            logger.info(f"Extracted diagnostic data: {json.dumps(diagnostic_data, indent=2)}")
+            log_payload(logger, "Extracted diagnostic data", diagnostic_data)
         else:
             raise ValueError("Diagnostic data not found in the input")
 
         # Format diagnostic data for insertion
-        formatted_data = format_diagnostic_data(diagnostic_data)
-        logger.info(f"Formatted diagnostic data: {json.dumps(formatted_data, indent=2)}")
+        with timer('transform'):
+            formatted_data = format_diagnostic_data(diagnostic_data)
+        log_payload(logger, "Formatted diagnostic data", formatted_data)
 
         # Insert data into PostgreSQL
         insert_result = insert_into_postgres(formatted_data)
 
         # Prepare the output
-        output = {
-            'statusCode': 200,
-            'body': json.dumps({
+        with timer('serialize'):
+            output_body = dumps({
                 'message': 'Diagnostic data processed and inserted successfully',
                 'insert_result': insert_result,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
             })
+        count('output_bytes', len(output_body))
+        output = {
+            'statusCode': 200,
+            'body': output_body
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing diagnostic data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
@@ -67,57 +118,130 @@ def lambda_handler(event, context):
         }
 
 def format_diagnostic_data(diagnostic_data):
+    if DIAGNOSTIC_LOAD_MODE == 'normalized':
+        return format_normalized_diagnostic_data(diagnostic_data)
+
     formatted_data = {
         'token': diagnostic_data['token'],
         'status': diagnostic_data['status'],
         'json_ver': diagnostic_data['json_ver'],
-        'timestamp': diagnostic_data['timestamp'],
-        'diagnosParam': json.dumps(diagnostic_data['diagnosParam']),
-        'commParam': json.dumps(diagnostic_data['commParam']),
-        'storedDiagParams': json.dumps(diagnostic_data['storedDiagParams'])
+        'timestamp': to_db_timestamp(diagnostic_data['timestamp']),
+        'diagnosParam': dumps(diagnostic_data['diagnosParam']),
+        'commParam': dumps(diagnostic_data['commParam']),
+        'storedDiagParams': dumps(diagnostic_data['storedDiagParams'])
     }
     return formatted_data
 
+def format_normalized_diagnostic_data(diagnostic_data):
+    reading = {
+        'token': diagnostic_data['token'],
+        'status': diagnostic_data['status'],
+        'json_ver': diagnostic_data['json_ver'],
+        'timestamp': to_db_timestamp(diagnostic_data['timestamp'])
+    }
+    diagnos_param = diagnostic_data['diagnosParam']
+    reading.update((column, diagnos_param.get(key)) for key, column in DIAGNOS_PARAM_COLUMNS)
+    comm_param = diagnostic_data['commParam']
+    reading.update((column, comm_param.get(key)) for key, column in COMM_PARAM_COLUMNS)
+
+    # One row per paramN entry; reading_id is filled in after the reading is inserted
+    stored = diagnostic_data['storedDiagParams']
+    stored_params = [
+        (index,) + tuple(stored[name].get(key) for key, _ in STORED_PARAM_COLUMNS)
+        for name, index in param_indexes(stored).items()
+    ]
+    return {'reading': reading, 'stored_params': stored_params}
+
+def param_index(name):
+    # 'param3' -> 3; None for keys without a number
+    suffix = name[len('param'):]
+    return int(suffix) if name.startswith('param') and suffix.isdigit() else None
+
+def param_indexes(names):
+    """Map each storedDiagParams key to its param_index.
+
+    Keys that are not ``paramN``, or repeat an earlier key's number (such as
+    'param01' after 'param1'), are numbered after the largest ``paramN`` in
+    their order, so they never collide with a numbered entry, which ON
+    CONFLICT would then silently drop.
+    """
+    indexes = {}
+    unnumbered = []
+    for name in names:
+        index = param_index(name)
+        if index is None or index in indexes.values():
+            unnumbered.append(name)
+        else:
+            indexes[name] = index
+    if unnumbered:
+        logger.warning(f"storedDiagParams keys {unnumbered} are not distinct paramN keys; numbering them after the last paramN")
+        next_index = max(indexes.values(), default=0)
+        for next_index, name in enumerate(unnumbered, next_index + 1):
+            indexes[name] = next_index
+    return indexes
+
+def write_diagnostic(cur, data):
+    if not recent_keys.drop_seen(cur, [data.get('reading', data)]):
+        return 0
+    if 'reading' in data:
+        return write_normalized_diagnostic(cur, data)
+
+    # SQL query for insertion
+    insert_query = """
+    INSERT INTO diagnostic_data (
+        token, status, json_ver, timestamp, diagnos_param, comm_param, stored_diag_params
+    ) VALUES (
+        %(token)s, %(status)s, %(json_ver)s, %(timestamp)s, %(diagnosParam)s, %(commParam)s, %(storedDiagParams)s
+    )
+    ON CONFLICT (token, timestamp) DO NOTHING
+    """
+
+    # Execute the insertion; rowcount is 0 when the reading is already stored
+    cur.execute(insert_query, data)
+    count('rows_skipped', 1 - cur.rowcount)
+    return cur.rowcount
+
+def write_normalized_diagnostic(cur, data):
+    cur.execute(READING_INSERT_SQL, data['reading'])
+    inserted = cur.fetchone()
+    if inserted is None:
+        # Already stored, together with its stored parameters
+        logger.info("Skipped diagnostic reading that is already stored")
+        count('rows_skipped', 1)
+        return 0
+    reading_id = inserted[0]
+
+    # All stored parameters in a single statement
+    stored_params = [(reading_id,) + row for row in data['stored_params']]
+    insert_values(cur, STORED_PARAMS_INSERT_SQL, stored_params, page_size=max(len(stored_params), 1))
+    logger.info(f"Wrote diagnostic reading {reading_id} with {len(stored_params)} stored parameters")
+    return 1
+
 def insert_into_postgres(data):
-    conn = None
     try:
-        # Connect to the PostgreSQL database
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
-
-        # SQL query for insertion
-        insert_query = """
-        INSERT INTO diagnostic_data (
-            token, status, json_ver, timestamp, diagnos_param, comm_param, stored_diag_params
-        ) VALUES (
-            %(token)s, %(status)s, %(json_ver)s, %(timestamp)s, %(diagnosParam)s, %(commParam)s, %(storedDiagParams)s
-        )
-        """
-
-        # Execute the insertion
-        cur.execute(insert_query, data)
-
-        # Commit the transaction
-        conn.commit()
+        # Borrow a warm connection from the container-wide pool
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            with timer('db_execute'):
+                inserted = write_diagnostic(cur, data)
+
+            # Commit the transaction
+            with timer('db_commit'):
+                conn.commit()
+        count('rows_written', int(inserted))
 
+        if not inserted:
+            return "Skipped 1 duplicate record"
         logger.info("Successfully inserted diagnostic data into the database")
+        if 'reading' in data:
+            return f"Inserted 1 record and {len(data['stored_params'])} stored parameters"
         return "Inserted 1 record"
 
     except (Exception, psycopg2.Error) as error:
         logger.error(f"Error inserting data into PostgreSQL: {error}")
-        if conn:
-            conn.rollback()
         raise
 
     finally:
-        if conn:
-            cur.close()
-            conn.close()
+        logger.info(f"Connection pool stats: {db_pool.stats()}")
 
 # For local testing
 if __name__ == "__main__":
@@ -1,65 +1,90 @@
 import json
-import logging
 import os
 import psycopg2
 from datetime import datetime
+from operator import itemgetter
+from bulkload import INSERT_PAGE_SIZE, build_insert, insert_values
+from codec import dumps, parse_event_body
+from dbpool import db_pool
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from recentkeys import RecentKeys
+from timestamps import to_db_timestamp
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-# Database connection parameters
-DB_HOST = '54.147.228.91'
-DB_NAME = 'postgres'
-DB_USER = 'postgres'
-DB_PASSWORD = 'postgresql'
-
+logger = get_logger('error-load')
+
+# Set to false until SQL/error-catalog.sql has added error_data.error_category_id
+ERROR_STORE_CATEGORY = os.environ.get('ERROR_STORE_CATEGORY', 'true').lower() == 'true'
+# Set to false to store only error_category_id and leave descriptions to the error_codes table
+ERROR_STORE_DESCRIPTION = os.environ.get('ERROR_STORE_DESCRIPTION', 'true').lower() == 'true'
+
+if not (ERROR_STORE_CATEGORY or ERROR_STORE_DESCRIPTION):
+    raise ValueError("ERROR_STORE_DESCRIPTION=false needs ERROR_STORE_CATEGORY=true, or errors are stored without either")
+
+# error_data columns, in INSERT order
+ERROR_COLUMNS = (
+    'token', 'status', 'json_ver', 'timestamp', 'error_code', 'error_description'
+) + (('error_category_id',) if ERROR_STORE_CATEGORY else ())
+# Natural key of an error report; redelivered reports are skipped
+ERROR_KEY = ('token', 'timestamp', 'error_code')
+# Statement and row template are built once per container
+ERROR_INSERT_SQL, ERROR_ROW_TEMPLATE = build_insert('error_data', ERROR_COLUMNS, named=True, conflict=ERROR_KEY)
+# Rows sent per INSERT statement
+ERROR_INSERT_PAGE_SIZE = int(os.environ.get('ERROR_INSERT_PAGE_SIZE', INSERT_PAGE_SIZE))
+
+# Keys committed by this container, checked before any database round trip
+recent_keys = RecentKeys(itemgetter(*ERROR_KEY))
+
+@instrumented('error-load')
 def lambda_handler(event, context):
     logger.info("Error Data DB Inserter Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract error data
         if 'error' in body:
             error_data = body['error']
-            logger.info(f"Extracted error data: {json.dumps(error_data, indent=2)}")
+            log_payload(logger, "Extracted error data", error_data)
         else:
             raise ValueError("Error data not found in the input")
 
         # Format error data for insertion
-        formatted_data = format_error_data(error_data)
-        logger.info(f"Formatted error data: {json.dumps(formatted_data, indent=2)}")
+        with timer('transform'):
+            formatted_data = format_error_data(error_data)
+        count('rows', len(formatted_data))
+        log_payload(logger, "Formatted error data", formatted_data)
 
         # Insert data into PostgreSQL
         insert_result = insert_into_postgres(formatted_data)
 
         # Prepare the output
-        output = {
-            'statusCode': 200,
-            'body': json.dumps({
+        with timer('serialize'):
+            output_body = dumps({
                 'message': 'Error data processed and inserted successfully',
                 'insert_result': insert_result,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
             })
+        count('output_bytes', len(output_body))
+        output = {
+            'statusCode': 200,
+            'body': output_body
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing error data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
@@ -73,54 +98,44 @@ def format_error_data(error_data):
             'token': error_data['token'],
             'status': error_data['status'],
             'json_ver': error_data['json_ver'],
-            'timestamp': error['timestamp'],
+            'timestamp': to_db_timestamp(error['timestamp']),
             'error_code': error['error_code'],
-            'error_description': error['error_description']
+            'error_description': error['error_description'] if ERROR_STORE_DESCRIPTION else None,
+            'error_category_id': error.get('error_category_id')
         }
         formatted_data.append(formatted_error)
     return formatted_data
 
+def write_errors(cur, data):
+    data = recent_keys.drop_seen(cur, data)
+    if not data:
+        return 0
+
+    # Send the rows in pages of ERROR_INSERT_PAGE_SIZE per statement
+    # Rows already stored are skipped by ON CONFLICT and not counted
+    return insert_values(cur, ERROR_INSERT_SQL, data, template=ERROR_ROW_TEMPLATE, page_size=ERROR_INSERT_PAGE_SIZE)
+
 def insert_into_postgres(data):
-    conn = None
     try:
-        # Connect to the PostgreSQL database
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
-
-        # SQL query for insertion
-        insert_query = """
-        INSERT INTO error_data (
-            token, status, json_ver, timestamp, error_code, error_description
-        ) VALUES (
-            %(token)s, %(status)s, %(json_ver)s, %(timestamp)s, %(error_code)s, %(error_description)s
-        )
-        """
-
-        # Execute the insertion for each data point
-        for item in data:
-            cur.execute(insert_query, item)
-
-        # Commit the transaction
-        conn.commit()
-
-        logger.info(f"Successfully inserted {len(data)} records into the database")
-        return f"Inserted {len(data)} records"
+        # Borrow a warm connection from the container-wide pool
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            with timer('db_execute'):
+                inserted = write_errors(cur, data)
+
+            # Commit the transaction
+            with timer('db_commit'):
+                conn.commit()
+        count('rows_written', int(inserted))
+
+        logger.info(f"Successfully inserted {inserted} records into the database")
+        return f"Inserted {inserted} records"
 
     except (Exception, psycopg2.Error) as error:
         logger.error(f"Error inserting data into PostgreSQL: {error}")
-        if conn:
-            conn.rollback()
         raise
 
     finally:
-        if conn:
-            cur.close()
-            conn.close()
+        logger.info(f"Connection pool stats: {db_pool.stats()}")
 
 # For local testing
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime
+import psycopg2
+from codec import dumps, parse_event_body
+from dbpool import db_pool
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from stageloader import STAGE_ROOT, load_stage
+
+# Set up logging
+logger = get_logger('multisection-load')
+
+# How sections are committed:
+#   'per_section' - each section is written on its own pooled connection, all
+#                   at once, and committed independently (default)
+#   'atomic'      - all sections are written on one connection and committed
+#                   together, or not at all
+MULTI_LOAD_TRANSACTION = os.environ.get('MULTI_LOAD_TRANSACTION', 'per_section')
+# Sections written at the same time; keep at or below DB_POOL_MAX_SIZE
+MULTI_LOAD_WORKERS = int(os.environ.get('MULTI_LOAD_WORKERS', '4'))
+
+# section -> (loader module, format function, write function)
+SECTION_LOADERS = {
+    'telemetry': (load_stage('TRANSFORMandLOAD/telemetry-transformandinsert.py'), 'format_telemetry_data', 'write_telemetry'),
+    'error': (load_stage('TRANSFORMandLOAD/error-transformandinsert.py'), 'format_error_data', 'write_errors'),
+    'pump': (load_stage('TRANSFORMandLOAD/pump-transformandinsert.py'), 'format_pump_data', 'write_pump'),
+    'diagnostic': (load_stage('TRANSFORMandLOAD/diagnostic-transformandinsert.py'), 'format_diagnostic_data', 'write_diagnostic')
+}
+
+# Created once per container and reused by warm invocations
+_executor = ThreadPoolExecutor(max_workers=MULTI_LOAD_WORKERS, thread_name_prefix='multisection-load')
+
+@instrumented('multisection-load')
+def lambda_handler(event, context):
+    logger.info("Multi-section Transform and Load Lambda function started")
+    log_payload(logger, "Received event", event)
+
+    try:
+        # A Parallel state hands over the list of extractor outputs
+        outputs = event if isinstance(event, list) else [event]
+        extracted = merge_extractor_outputs(outputs)
+
+        formatted = format_sections(extracted)
+        results, errors = load_sections(formatted)
+
+        if errors:
+            return {
+                'statusCode': 500,
+                'body': dumps({
+                    'message': 'One or more sections failed to load',
+                    'results': results,
+                    'errors': errors,
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'status': 'error'
+                })
+            }
+
+        return {
+            'statusCode': 200,
+            'body': dumps({
+                'message': 'Data transformed and inserted successfully',
+                'results': results,
+                'timestamp': datetime.utcnow().isoformat(),
+                'status': 'success'
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Error processing event: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': dumps({
+                'error': str(e),
+                'timestamp': datetime.utcnow().isoformat(),
+                'status': 'error'
+            })
+        }
+
+def merge_extractor_outputs(outputs):
+    """Collect the section data of every extractor output.
+
+    Only the section keys are copied, so each output's ``timestamp`` and
+    ``status`` stay behind. Any output whose ``statusCode`` is not 200 fails
+    the whole load, naming its section.
+    """
+    extracted = {}
+    for position, output in enumerate(outputs):
+        body = parse_event_body(output)
+        status = output.get('statusCode', 200) if isinstance(output, dict) else 200
+        if status != 200:
+            section = body.get('section') if isinstance(body, dict) else None
+            error = body.get('error') if isinstance(body, dict) else body
+            raise ValueError(
+                f"{section or f'Parallel branch {position}'} extractor failed "
+                f"with status {status}: {error}"
+            )
+        for section in SECTION_LOADERS:
+            if section in body:
+                extracted[section] = body[section]
+    return extracted
+
+def format_sections(extracted):
+    """Run each section's ``format_*_data`` on its extractor output."""
+    formatted = {}
+    for section, section_data in extracted.items():
+        loader, format_name, _ = SECTION_LOADERS[section]
+        with timer('transform'):
+            formatted[section] = getattr(loader, format_name)(section_data)
+    return formatted
+
+def load_sections(formatted, transaction=None):
+    """Write formatted sections to PostgreSQL.
+
+    Returns ``(results, errors)``: the number of records written per section,
+    and the error message of every section that failed. In atomic mode a
+    failure rolls back every section.
+    """
+    transaction = transaction or MULTI_LOAD_TRANSACTION
+    start = time.perf_counter()
+
+    if transaction == 'atomic':
+        results, errors = _load_atomic(formatted)
+    else:
+        results, errors = _load_concurrent(formatted)
+
+    logger.info(
+        f"Loaded sections={sorted(results)} failed={sorted(errors)} transaction={transaction} "
+        f"duration_ms={(time.perf_counter() - start) * 1000:.2f}"
+    )
+    return results, errors
+
+def _load_concurrent(formatted):
+    # One pooled connection and one commit per section, all in flight at once.
+    # Each task runs in a copy of this context, so its timers reach the invocation's metrics.
+    futures = {
+        section: _executor.submit(copy_context().run, _load_section, section, data)
+        for section, data in formatted.items()
+    }
+
+    results = {}
+    errors = {}
+    for section, future in futures.items():
+        try:
+            results[section] = future.result()
+        except (Exception, psycopg2.Error) as error:
+            logger.error(f"Error inserting {section} data into PostgreSQL: {error}")
+            errors[section] = str(error)
+    return results, errors
+
+def _load_section(section, data):
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        with timer('db_execute'):
+            written = write_section(cur, section, data)
+        with timer('db_commit'):
+            conn.commit()
+    count('rows_written', int(written))
+    return written
+
+def write_section(cur, section, data):
+    """Write one formatted section on ``cur`` without committing."""
+    loader, _, write_name = SECTION_LOADERS[section]
+    return getattr(loader, write_name)(cur, data)
+
+def _load_atomic(formatted):
+    # A transaction cannot span connections, so the sections share one
+    # connection and are written in turn
+    results = {}
+    try:
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            with timer('db_execute'):
+                for section, data in formatted.items():
+                    results[section] = write_section(cur, section, data)
+            with timer('db_commit'):
+                conn.commit()
+        count('rows_written', sum(map(int, results.values())))
+    except (Exception, psycopg2.Error) as error:
+        logger.error(f"Error inserting sections into PostgreSQL, transaction rolled back: {error}")
+        return {}, {section: str(error) for section in formatted}
+    return results, {}
+
+# For local testing
+if __name__ == "__main__":
+    with open(f"{STAGE_ROOT}/SAMPLE-PAYLOAD/payload.json") as f:
+        sample_payload = json.load(f)
+
+    receiver = load_stage('RECEIVE/payloadreceiver.py')
+    processed = receiver.process_message(sample_payload)
+    sample_event = {
+        'telemetry': load_stage('EXTRACT/telemetry-extract.py').process_telemetry(processed['telemetry']),
+        'error': load_stage('EXTRACT/error-extract.py').process_error(processed['error']),
+        'pump': load_stage('EXTRACT/pump-extract.py').process_pump(processed['pump']),
+        'diagnostic': load_stage('EXTRACT/diagnostic-extract.py').process_diagnostic(processed['diagnostic'])
+    }
+
+    result = lambda_handler(sample_event, None)
+    print(f"Lambda function result: {json.dumps(result, indent=2)}")
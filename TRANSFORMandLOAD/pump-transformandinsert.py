@@ -1,65 +1,90 @@
 import json
-import logging
 import os
 import psycopg2
 from datetime import datetime
+from operator import itemgetter
+from bulkload import INSERT_PAGE_SIZE, build_insert, insert_values
+from codec import dumps, parse_event_body
+from dbpool import db_pool
+from metrics import count, instrumented, timer
+from pipelinelog import get_logger, log_payload
+from recentkeys import RecentKeys
+from rollups import pump_rollup_sql
+from timestamps import to_db_timestamp
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-# Database connection parameters
-DB_HOST = '54.147.228.91'
-DB_NAME = 'postgres'
-DB_USER = 'postgres'
-DB_PASSWORD = 'postgresql'
-
+logger = get_logger('pump-load')
+
+# pump_data columns, in INSERT order
+PUMP_COLUMNS = (
+    'token', 'pump_start_time', 'start_discharge', 'start_data', 'start_no_data',
+    'start_cycle_slips', 'pump_stop_time', 'stop_discharge', 'stop_data',
+    'stop_no_data', 'stop_cycle_slips', 'pump_duration_seconds',
+    'discharge_difference', 'data_difference', 'no_data_difference',
+    'cycle_slips_difference'
+)
+# Natural key of a pump cycle; redelivered cycles are skipped
+PUMP_KEY = ('token', 'pump_start_time')
+# Statement and row template are built once per container. With ROLLUP_BUCKETS
+# set, the same statement merges the inserted cycles into pump_rollups.
+PUMP_INSERT_SQL, PUMP_ROW_TEMPLATE = build_insert(
+    'pump_data', PUMP_COLUMNS, named=True, conflict=PUMP_KEY, rollup=pump_rollup_sql()
+)
+# Rows sent per INSERT statement
+PUMP_INSERT_PAGE_SIZE = int(os.environ.get('PUMP_INSERT_PAGE_SIZE', INSERT_PAGE_SIZE))
+
+# Keys committed by this container, checked before any database round trip
+recent_keys = RecentKeys(itemgetter(*PUMP_KEY))
+
+@instrumented('pump-load')
 def lambda_handler(event, context):
     logger.info("Pump Data DB Inserter Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract pump data
         if 'pump' in body:
             pump_data = body['pump']
-            logger.info(f"Extracted pump data: {json.dumps(pump_data, indent=2)}")
+            log_payload(logger, "Extracted pump data", pump_data)
         else:
             raise ValueError("Pump data not found in the input")
 
         # Format pump data for insertion
-        formatted_data = format_pump_data(pump_data)
-        logger.info(f"Formatted pump data: {json.dumps(formatted_data, indent=2)}")
+        with timer('transform'):
+            formatted_data = format_pump_data(pump_data)
+        count('rows', len(formatted_data))
+        log_payload(logger, "Formatted pump data", formatted_data)
 
         # Insert data into PostgreSQL
         insert_result = insert_into_postgres(formatted_data)
 
         # Prepare the output
-        output = {
-            'statusCode': 200,
-            'body': json.dumps({
+        with timer('serialize'):
+            output_body = dumps({
                 'message': 'Pump data processed and inserted successfully',
                 'insert_result': insert_result,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
             })
+        count('output_bytes', len(output_body))
+        output = {
+            'statusCode': 200,
+            'body': output_body
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing pump data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
@@ -71,12 +96,12 @@ def format_pump_data(pump_data):
     for param in pump_data['params']:
         formatted_param = {
             'token': pump_data['token'],
-            'pump_start_time': param['pump_start_time'],
+            'pump_start_time': to_db_timestamp(param['pump_start_time']),
             'start_discharge': param['start_discharge'],
             'start_data': param['start_data'],
             'start_no_data': param['start_no_data'],
             'start_cycle_slips': param['start_cycle_slips'],
-            'pump_stop_time': param['pump_stop_time'],
+            'pump_stop_time': to_db_timestamp(param['pump_stop_time']),
             'stop_discharge': param['stop_discharge'],
             'stop_data': param['stop_data'],
             'stop_no_data': param['stop_no_data'],
@@ -90,56 +115,36 @@ def format_pump_data(pump_data):
         formatted_data.append(formatted_param)
     return formatted_data
 
+def write_pump(cur, data):
+    data = recent_keys.drop_seen(cur, data)
+    if not data:
+        return 0
+
+    # Send the rows in pages of PUMP_INSERT_PAGE_SIZE per statement
+    # Rows already stored are skipped by ON CONFLICT and not counted
+    return insert_values(cur, PUMP_INSERT_SQL, data, template=PUMP_ROW_TEMPLATE, page_size=PUMP_INSERT_PAGE_SIZE)
+
 def insert_into_postgres(data):
-    conn = None
     try:
-        # Connect to the PostgreSQL database
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
-
-        # SQL query for insertion
-        insert_query = """
-        INSERT INTO pump_data (
-            token, pump_start_time, start_discharge, start_data, start_no_data,
-            start_cycle_slips, pump_stop_time, stop_discharge, stop_data,
-            stop_no_data, stop_cycle_slips, pump_duration_seconds,
-            discharge_difference, data_difference, no_data_difference,
-            cycle_slips_difference
-        ) VALUES (
-            %(token)s, %(pump_start_time)s, %(start_discharge)s, %(start_data)s,
-            %(start_no_data)s, %(start_cycle_slips)s, %(pump_stop_time)s,
-            %(stop_discharge)s, %(stop_data)s, %(stop_no_data)s,
-            %(stop_cycle_slips)s, %(pump_duration_seconds)s,
-            %(discharge_difference)s, %(data_difference)s,
-            %(no_data_difference)s, %(cycle_slips_difference)s
-        )
-        """
-
-        # Execute the insertion for each data point
-        for item in data:
-            cur.execute(insert_query, item)
-
-        # Commit the transaction
-        conn.commit()
-
-        logger.info(f"Successfully inserted {len(data)} records into the database")
-        return f"Inserted {len(data)} records"
+        # Borrow a warm connection from the container-wide pool
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            with timer('db_execute'):
+                inserted = write_pump(cur, data)
+
+            # Commit the transaction
+            with timer('db_commit'):
+                conn.commit()
+        count('rows_written', int(inserted))
+
+        logger.info(f"Successfully inserted {inserted} records into the database")
+        return f"Inserted {inserted} records"
 
     except (Exception, psycopg2.Error) as error:
         logger.error(f"Error inserting data into PostgreSQL: {error}")
-        if conn:
-            conn.rollback()
         raise
 
     finally:
-        if conn:
-            cur.close()
-            conn.close()
+        logger.info(f"Connection pool stats: {db_pool.stats()}")
 
 # For local testing
 if __name__ == "__main__":
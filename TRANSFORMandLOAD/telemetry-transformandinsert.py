@@ -1,65 +1,92 @@
 import json
-import logging
 import os
 import psycopg2
 from datetime import datetime
+from bulkload import bulk_insert
+from codec import dumps, parse_event_body
+from dbpool import db_pool
+from metrics import count, instrumented, timer
+from partitions import PartitionManager
+from pipelinelog import get_logger, log_payload
+from recentkeys import RecentKeys
+from rollups import telemetry_rollup_sql
+from telemetrybatch import TELEMETRY_COLUMNS, TelemetryBatch
+from timestamps import to_db_timestamp
 
 # Set up logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger('telemetry-load')
 
-# Database connection parameters
-DB_HOST = '54.147.228.91'
-DB_NAME = 'postgres'
-DB_USER = 'postgres'
-DB_PASSWORD = 'postgresql'
+# Natural key of a sample; redelivered samples are skipped
+TELEMETRY_KEY = ('token', 'timestamp')
 
+# 'day' or 'month' when telemetry_data is range-partitioned on timestamp
+# (see SQL/telemetry-partitioning.sql); empty for a plain table
+TELEMETRY_PARTITION_INTERVAL = os.environ.get('TELEMETRY_PARTITION_INTERVAL', '')
+# Partitions created ahead of the newest sample in each batch
+TELEMETRY_PARTITION_PRECREATE = int(os.environ.get('TELEMETRY_PARTITION_PRECREATE', '2'))
+
+# Per-minute/hour aggregates merged from the inserted rows (see ROLLUP_BUCKETS)
+TELEMETRY_ROLLUP_SQL = telemetry_rollup_sql()
+
+# Partition names are cached per container; DDL runs on the pool's reserved connection
+partitions = (
+    PartitionManager('telemetry_data', TELEMETRY_PARTITION_INTERVAL, db_pool.reserved, TELEMETRY_PARTITION_PRECREATE)
+    if TELEMETRY_PARTITION_INTERVAL else None
+)
+
+# Keys committed by this container, checked before any database round trip.
+# Rows are tuples in TELEMETRY_COLUMNS order, so the key is their first two values.
+recent_keys = RecentKeys(lambda row: row[:2])
+
+@instrumented('telemetry-load')
 def lambda_handler(event, context):
     logger.info("Telemetry DB Inserter Lambda function started")
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Parse the input event
-        if 'body' in event:
-            body = json.loads(event['body'])
-        else:
-            body = event
+        body = parse_event_body(event)
 
-        logger.info(f"Parsed body: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Parsed body", body)
 
         # Extract telemetry data
         if 'telemetry' in body:
             telemetry_data = body['telemetry']
-            logger.info(f"Extracted telemetry data: {json.dumps(telemetry_data, indent=2)}")
+            log_payload(logger, "Extracted telemetry data", telemetry_data)
         else:
             raise ValueError("Telemetry data not found in the input")
 
         # Format telemetry data for insertion
-        formatted_data = format_telemetry_data(telemetry_data)
-        logger.info(f"Formatted telemetry data: {json.dumps(formatted_data, indent=2)}")
+        with timer('transform'):
+            formatted_data = format_telemetry_data(telemetry_data)
+        count('rows', len(formatted_data))
+        log_payload(logger, "Formatted telemetry data", formatted_data)
 
         # Insert data into PostgreSQL
         insert_result = insert_into_postgres(formatted_data)
 
         # Prepare the output
-        output = {
-            'statusCode': 200,
-            'body': json.dumps({
+        with timer('serialize'):
+            output_body = dumps({
                 'message': 'Telemetry data processed and inserted successfully',
                 'insert_result': insert_result,
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'success'
             })
+        count('output_bytes', len(output_body))
+        output = {
+            'statusCode': 200,
+            'body': output_body
         }
 
-        logger.info(f"Processed output: {json.dumps(output, indent=2)}")
+        log_payload(logger, "Processed output", output)
         return output
 
     except Exception as e:
         logger.error(f"Error processing telemetry data: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps({
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat(),
                 'status': 'error'
@@ -67,11 +94,15 @@ def lambda_handler(event, context):
         }
 
 def format_telemetry_data(telemetry_data):
+    # Columnar extractor output is loaded without building per-row dicts
+    if 'columns' in telemetry_data:
+        return TelemetryBatch.from_dict(telemetry_data)
+
     formatted_data = []
     for param in telemetry_data['params']:
         formatted_param = {
             'token': telemetry_data['token'],
-            'timestamp': param['timestamp'],
+            'timestamp': to_db_timestamp(param['timestamp']),
             'flow_rate': param['flow_rate'],
             'discharge': param['discharge'],
             'work_hours': param['work_hours'],
@@ -84,51 +115,52 @@ def format_telemetry_data(telemetry_data):
         formatted_data.append(formatted_param)
     return formatted_data
 
-def insert_into_postgres(data):
-    conn = None
-    try:
-        # Connect to the PostgreSQL database
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
+def telemetry_rows(formatted_data):
+    # Yield rows as tuples so they can be streamed without another copy
+    if isinstance(formatted_data, TelemetryBatch):
+        return formatted_data.rows()
+    return (tuple(item[column] for column in TELEMETRY_COLUMNS) for item in formatted_data)
+
+def write_telemetry(cur, data):
+    rows = recent_keys.drop_seen(cur, telemetry_rows(data))
+    if partitions is None:
+        row_count = len(rows) if isinstance(rows, list) else len(data)
+        # COPY large batches, multi-row INSERT small ones
+        return bulk_insert(
+            cur, 'telemetry_data', TELEMETRY_COLUMNS, rows, row_count,
+            conflict=TELEMETRY_KEY, rollup=TELEMETRY_ROLLUP_SQL
         )
-        cur = conn.cursor()
-
-        # SQL query for insertion
-        insert_query = """
-        INSERT INTO telemetry_data (
-            token, timestamp, flow_rate, discharge, work_hours, 
-            cumulative_reverse_discharge, data_count, cycle_slips, 
-            no_data_count, uss
-        ) VALUES (
-            %(token)s, %(timestamp)s, %(flow_rate)s, %(discharge)s, 
-            %(work_hours)s, %(cumulative_reverse_discharge)s, 
-            %(data_count)s, %(cycle_slips)s, %(no_data_count)s, %(uss)s
+
+    # Load each day's or month's rows straight into its partition
+    inserted = 0
+    for table, partition_rows in partitions.route(cur, rows, TELEMETRY_COLUMNS.index('timestamp')).items():
+        inserted += bulk_insert(
+            cur, table, TELEMETRY_COLUMNS, partition_rows,
+            conflict=TELEMETRY_KEY, rollup=TELEMETRY_ROLLUP_SQL
         )
-        """
+    return inserted
 
-        # Execute the insertion for each data point
-        for item in data:
-            cur.execute(insert_query, item)
+def insert_into_postgres(data):
+    try:
+        # Borrow a warm connection from the container-wide pool
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            with timer('db_execute'):
+                inserted = write_telemetry(cur, data)
 
-        # Commit the transaction
-        conn.commit()
+            # Commit the transaction
+            with timer('db_commit'):
+                conn.commit()
+        count('rows_written', int(inserted))
 
-        logger.info(f"Successfully inserted {len(data)} records into the database")
-        return f"Inserted {len(data)} records"
+        logger.info(f"Successfully inserted {inserted} records into the database")
+        return f"Inserted {inserted} records"
 
     except (Exception, psycopg2.Error) as error:
         logger.error(f"Error inserting data into PostgreSQL: {error}")
-        if conn:
-            conn.rollback()
         raise
 
     finally:
-        if conn:
-            cur.close()
-            conn.close()
+        logger.info(f"Connection pool stats: {db_pool.stats()}")
 
 # For local testing
 if __name__ == "__main__":
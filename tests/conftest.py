@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Shared modules are imported by name, as on the Lambda layer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'COMMON'))
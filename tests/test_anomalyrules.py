@@ -0,0 +1,71 @@
+import pytest
+
+import anomalyrules
+from anomalyrules import find_anomalies, get_rule_set
+
+HEADER = {'token': 'FM1037', 'status': 'ok', 'json-ver': 'v1.2'}
+
+
+def baseline_anomalies(data):
+    """(rule id, row) of every anomaly the original check_anomalies reported."""
+    found = []
+    for row, param in enumerate(data['telemetry']['teleParam']):
+        if param['flowRate'] < 0 or param['flowRate'] > 100:
+            found.append(('telemetry.flow_rate_range', row))
+        if param['discharge'] < 0:
+            found.append(('telemetry.negative_discharge', row))
+    for row, param in enumerate(data['error']['mspErrParam']):
+        if param['err-code'] > 200:
+            found.append(('error.high_error_code', row))
+    for row, param in enumerate(data['pump']['pumpParam']):
+        if param['PumpStoptTs'] <= param['PumpStartTs']:
+            found.append(('pump.stop_not_after_start', row))
+    rssi = data['diagnostic']['diagnosParam']['RSSI']
+    if rssi > -30 or rssi < -120:
+        found.append(('diagnostic.rssi_range', 0))
+    return sorted(found)
+
+
+def payload(repeat=1, rssi=-54):
+    flow_rates = [-0.1, 0, 50, 100, 100.1]
+    discharges = [-1, 0, 1, 36301, 5]
+    return {
+        'telemetry': dict(HEADER, teleParam=[
+            {'flowRate': flow_rate, 'discharge': discharge}
+            for flow_rate, discharge in zip(flow_rates, discharges)
+        ] * repeat),
+        'error': dict(HEADER, mspErrParam=[{'err-code': code} for code in (127, 200, 201)] * repeat),
+        'pump': dict(HEADER, pumpParam=[
+            {'PumpStartTs': 1000, 'PumpStoptTs': stop} for stop in (999, 1000, 1001)
+        ] * repeat),
+        'diagnostic': dict(HEADER, diagnosParam={'RSSI': rssi})
+    }
+
+
+def found(data):
+    return sorted((anomaly['rule'], anomaly['row']) for anomaly in find_anomalies(data))
+
+
+@pytest.mark.parametrize('rssi', [-121, -120, -54, -30, -29])
+def test_rules_match_the_original_thresholds(rssi):
+    data = payload(rssi=rssi)
+    assert found(data) == baseline_anomalies(data)
+
+
+def test_vectorized_rules_match_the_original_thresholds(monkeypatch):
+    pytest.importorskip('numpy')
+    monkeypatch.setattr(anomalyrules, 'ANOMALY_VECTOR_MIN_ROWS', 1)
+    data = payload(repeat=20)
+    assert found(data) == baseline_anomalies(data)
+
+
+def test_anomaly_records_carry_the_offending_value():
+    data = payload()
+    records = [anomaly for anomaly in find_anomalies(data) if anomaly['rule'] == 'telemetry.flow_rate_range']
+    assert [(record['section'], record['row'], record['value']) for record in records] == \
+        [('telemetry', 0, -0.1), ('telemetry', 4, 100.1)]
+
+
+def test_unknown_versions_share_the_wildcard_rule_set():
+    assert get_rule_set('telemetry', 'v99.untrusted') is get_rule_set('telemetry', '*')
+    assert get_rule_set('telemetry', ['not', 'hashable']) is get_rule_set('telemetry', '*')
@@ -0,0 +1,81 @@
+import json
+import math
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+import codec
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, monkeypatch):
+    """Run a test once per JSON backend; the orjson run is skipped without orjson."""
+    if request.param == 'orjson':
+        if codec.orjson is None:
+            pytest.skip('orjson is not installed')
+    else:
+        monkeypatch.setattr(codec, 'orjson', None)
+    return request.param
+
+
+def test_dumps_is_compact_and_keeps_non_ascii(backend):
+    assert codec.dumps({'token': 'FM1037', 'reason': 'señal', 'values': [1, 2.5, None]}) == \
+        '{"token":"FM1037","reason":"señal","values":[1,2.5,null]}'
+
+
+def test_dumps_writes_datetimes_as_iso_8601(backend):
+    document = {
+        'aware': datetime(2024, 11, 22, 5, 30, 51, 768000, tzinfo=timezone.utc),
+        'naive': datetime(2024, 11, 22, 5, 30, 51),
+        'day': date(2024, 11, 22),
+        'time': time(5, 30)
+    }
+    assert json.loads(codec.dumps(document)) == {
+        'aware': '2024-11-22T05:30:51.768000+00:00',
+        'naive': '2024-11-22T05:30:51',
+        'day': '2024-11-22',
+        'time': '05:30:00'
+    }
+
+
+def test_dumps_encodes_integers_beyond_64_bits(backend):
+    assert codec.dumps({'uss': 2 ** 70}) == '{"uss":%d}' % 2 ** 70
+
+
+def test_dumps_converts_non_str_keys(backend):
+    assert json.loads(codec.dumps({1: 'a'})) == {'1': 'a'}
+
+
+def test_dumps_uses_default_for_other_types(backend):
+    assert codec.dumps({'value': object()}, default=lambda value: 'object') == '{"value":"object"}'
+    with pytest.raises(TypeError):
+        codec.dumps({'value': object()})
+
+
+def test_dumps_non_finite_floats_differ_by_backend(backend):
+    text = codec.dumps([math.nan, math.inf])
+    assert text == ('[null,null]' if backend == 'orjson' else '[NaN,Infinity]')
+
+
+@pytest.mark.parametrize('data', ['{"a":[1,2]}', b'{"a":[1,2]}', bytearray(b'{"a":[1,2]}'), memoryview(b'{"a":[1,2]}')])
+def test_loads_accepts_text_and_buffers(backend, data):
+    assert codec.loads(data) == {'a': [1, 2]}
+
+
+def test_parse_event_body_decodes_string_bodies_and_passes_objects_through():
+    assert codec.parse_event_body({'statusCode': 200, 'body': '{"telemetry":{}}'}) == {'telemetry': {}}
+    assert codec.parse_event_body({'body': {'telemetry': {}}}) == {'telemetry': {}}
+    assert codec.parse_event_body({'telemetry': {}}) == {'telemetry': {}}
+
+
+def test_encode_body_is_plain_json_by_default():
+    assert codec.encode_body({'status': 'success'}, 'receiver/v1') == '{"status":"success"}'
+
+
+def test_compressed_envelope_round_trips(monkeypatch):
+    monkeypatch.setattr(codec, 'INTERSTAGE_COMPRESS_MIN_BYTES', 1)
+    document = {'processed_data': {'telemetry': {'teleParam': [{'ts': 1732253451768}] * 50}}}
+    envelope = codec.encode_body(document, 'receiver/v1')
+    assert codec.is_envelope(envelope)
+    assert envelope['compression'] == 'zlib'
+    assert codec.parse_event_body({'body': envelope}) == document
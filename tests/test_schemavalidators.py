@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from schemavalidators import MAX_REPORTED_ROWS, SchemaValidationError, get_validator
+
+SAMPLE_PAYLOAD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'SAMPLE-PAYLOAD', 'payload.json')
+
+
+@pytest.fixture
+def sample():
+    with open(SAMPLE_PAYLOAD) as f:
+        return json.load(f)
+
+
+def validate(section, data, row_offset=0):
+    return get_validator(section, data.get('json-ver', '*')).validate(data, row_offset)
+
+
+@pytest.mark.parametrize('section', ['telemetry', 'error', 'pump', 'diagnostic'])
+def test_sample_payload_is_valid(sample, section):
+    assert validate(section, sample[section]) is sample[section]
+
+
+def test_errors_are_value_errors(sample):
+    del sample['telemetry']['token']
+    with pytest.raises(ValueError):
+        validate('telemetry', sample['telemetry'])
+
+
+def test_missing_section_fields_are_listed(sample):
+    del sample['diagnostic']['commParam']
+    del sample['diagnostic']['status']
+    with pytest.raises(SchemaValidationError) as error:
+        validate('diagnostic', sample['diagnostic'])
+    assert str(error.value) == "Invalid diagnostic section: missing required fields ['commParam', 'status']"
+    assert error.value.section == 'diagnostic'
+
+
+def test_rows_must_be_a_list(sample):
+    sample['pump']['pumpParam'] = {}
+    with pytest.raises(SchemaValidationError, match=r"^Invalid pump section: 'pumpParam' must be a list$"):
+        validate('pump', sample['pump'])
+
+
+def test_every_bad_row_is_reported_with_its_offset(sample):
+    row = sample['error']['mspErrParam'][0]
+    sample['error']['mspErrParam'] = [row, {'ts': 1}, 'bad']
+    with pytest.raises(SchemaValidationError) as error:
+        validate('error', sample['error'], row_offset=100)
+    assert error.value.problems == ["row 101 missing ['err-code']", 'row 102 is not an object']
+
+
+def test_long_problem_lists_are_summarized(sample):
+    sample['error']['mspErrParam'] = [{}] * (MAX_REPORTED_ROWS + 3)
+    with pytest.raises(SchemaValidationError) as error:
+        validate('error', sample['error'])
+    assert len(error.value.problems) == MAX_REPORTED_ROWS + 3
+    assert str(error.value).endswith('; and 3 more')
+
+
+def test_non_object_sections_are_rejected():
+    with pytest.raises(SchemaValidationError, match='section must be an object'):
+        get_validator('telemetry').validate([])
+
+
+def test_unknown_sections_have_no_validator():
+    assert get_validator('firmware') is None
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from streamingest import iter_section_chunks
+
+
+def telemetry_body(rows, header_first=True):
+    header = {'token': 'FM1037', 'status': 'ok', 'json-ver': 'v1.2'}
+    samples = {'teleParam': [{'ts': 1732253451768 + index} for index in range(rows)]}
+    section = {**header, **samples} if header_first else {**samples, **header}
+    return json.dumps({'telemetry': section})
+
+
+def test_rows_after_the_header_are_chunked():
+    chunks = list(iter_section_chunks(telemetry_body(10), chunk_rows=3))
+    assert [len(chunk.rows) for chunk in chunks] == [3, 3, 3, 1]
+    assert [chunk.offset for chunk in chunks] == [0, 3, 6, 9]
+    assert [chunk.last for chunk in chunks] == [False, False, False, True]
+    assert chunks[0].header['json-ver'] == 'v1.2'
+
+
+def test_rows_before_the_header_are_held_until_it_arrives():
+    # A chunk cannot be validated without token and json-ver, so the memory
+    # bound only holds when the header precedes the samples
+    pytest.importorskip('ijson')
+    chunks = list(iter_section_chunks(telemetry_body(10, header_first=False), chunk_rows=3))
+    assert [len(chunk.rows) for chunk in chunks] == [10]
+    assert chunks[0].last